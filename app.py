@@ -1,16 +1,68 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, g
 import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
-import requests
-from functools import lru_cache
-import yfinance as yf
+from utils.http_client import http_get
+from utils.http_cache import CacheHTTP
 import time
-from bs4 import BeautifulSoup
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import os
+import hashlib
+import hmac
+import gzip
+import logging
+import threading
+import cProfile
+import pstats
+from contextlib import ExitStack
+from cachetools import TTLCache
+from utils.series_store import SeriesStore
+from utils.csv_registry import RegistroCSV
+from utils.ultimas_copias import UltimasCopias
+from utils.single_flight import SingleFlight
+from utils.materializacao import Materializados
+from utils.formato_binario import codificar_series, MIMETYPE as MIMETYPE_BINARIO
+from utils import metricas
+
+# brotli é opcional: sem ele, as respostas são comprimidas só com gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+from utils.series import (
+    acumular_percentual, criar_serie, serie_vazia, serie_para_listas, alinhar_series, valores_para_json, POLITICAS_ALINHAMENTO,
+    reduzir_pontos, para_mensal, estatisticas_moveis
+)
 
 app = Flask(__name__)
 
+# Mensagens por requisição vão para o logging (nível em LOG_LEVEL), não para o stdout
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING'), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+# Token que habilita o perfil de uma requisição pelo cabeçalho X-Perfil (vazio = desligado)
+PERFIL_TOKEN = os.environ.get('PERFIL_TOKEN', '')
+
+# Endereços das fontes externas; podem apontar para servidores locais (ex.: teste de carga)
+BCB_API_URL = os.environ.get('BCB_API_URL', 'https://api.bcb.gov.br').rstrip('/')
+GITHUB_RAW_URL = os.environ.get('GITHUB_RAW_URL', 'https://raw.githubusercontent.com').rstrip('/')
+DADOS_GITHUB_URL = f'{GITHUB_RAW_URL}/GugaCasanova/Comparador_Indexadores/main/data'
+BIGMAC_URL = os.environ.get(
+    'BIGMAC_URL', f'{GITHUB_RAW_URL}/TheEconomist/big-mac-data/master/output-data/big-mac-full-index.csv'
+)
+
+# Se definido, o Ibovespa é lido deste CSV (colunas Date e Close) em vez do yfinance
+IBOV_CSV_URL = os.environ.get('IBOV_CSV_URL')
+
+# Histórico local das séries do BCB, compartilhado entre workers e reinícios
+series_store = SeriesStore()
+
+# Junta buscas idênticas e simultâneas à mesma fonte/série numa só requisição
+voos = SingleFlight()
+
+# Arquivos remotos (CSV) guardados com ETag/Last-Modified para GET condicional
+cache_http = CacheHTTP()
+
 # Códigos das séries no BCB
 codigos_bcb = {
     'selic': 432,      # Meta Selic definida pelo Copom
@@ -23,113 +75,357 @@ codigos_bcb = {
     'gasolina': 32848, # Preço médio gasolina - São Paulo
     'energia': 28752,  # Tarifa média energia residencial - São Paulo
     'aluguel': 28140,  # Índice FipeZap - Aluguel - São Paulo
-    'plano_saude': 'https://raw.githubusercontent.com/GugaCasanova/Comparador_Indexadores/main/data/plano_saude.csv',  # CSV no GitHub
+    'plano_saude': f'{DADOS_GITHUB_URL}/plano_saude.csv',  # CSV no GitHub
 }
 
-def retry_request(func, retries=3, delay=1):
-    for attempt in range(retries):
-        try:
-            return func()
-        except Exception as e:
-            if attempt == retries - 1:
-                raise e
-            print(f"Tentativa {attempt + 1} falhou, tentando novamente em {delay} segundos...")
-            time.sleep(delay)
-
-@lru_cache(maxsize=128)
-def obter_dados_bcb_cached(codigo_serie, data_inicial_str, data_final_str):
-    def make_request():
-        url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo_serie}/dados"
-        params = {
-            'formato': 'json',
-            'dataInicial': data_inicial_str,
-            'dataFinal': data_final_str
-        }
-        
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+# Séries mantidas em arquivos CSV locais (data/), atualizadas pelos scripts
+arquivos_csv = {
+    'energia': 'energia.csv',
+    'cesta': 'cesta_basica.csv',
+    'gasolina': 'gasolina.csv',
+    'fipezap': 'fipezap.csv',
+    'plano_saude': 'plano_saude.csv'
+}
+
+# Indicadores aceitos pelas rotas de dados
+INDICADORES = list(dict.fromkeys([*codigos_bcb, *arquivos_csv, 'bigmac', 'ibov']))
+
+# Limite de indicadores por requisição na rota em lote
+MAX_INDICADORES_LOTE = int(os.environ.get('MAX_INDICADORES_LOTE', 12))
+
+# Carrega os CSVs uma vez na inicialização; depois só relê se o mtime mudar
+registro_csv = RegistroCSV(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+registro_csv.precarregar(arquivos_csv.values())
+
+# Tempo (em segundos) em que uma série mensal materializada é considerada atual
+VALIDADE_SERIES = int(os.environ.get('VALIDADE_COPIA_SERIES', 900))
+
+# Período 0 ("all time"): todo o histórico disponível, a partir desta data
+INICIO_HISTORICO = datetime.strptime(os.environ.get('INICIO_HISTORICO', '1980-01-01'), '%Y-%m-%d')
+
+# O SGS limita o tamanho da janela por consulta (10 anos nas séries diárias), então
+# o histórico longo é baixado em fatias desse tamanho
+ANOS_POR_CONSULTA_BCB = 10
+
+# Série mensal final de cada indicador, gravada num snapshot em data/materializado/ a cada
+# atualização e cobrindo todo o histórico (período 0); os workers mapeiam o mesmo arquivo
+# em memória e as requisições só recortam o período
+materializados = Materializados()
+PERIODO_MATERIALIZADO = '0'
+
+# Modo stale-while-revalidate: /dados responde com a última cópia boa de cada série
+# e uma thread de fundo atualiza as vencidas
+SERVIR_ULTIMA_COPIA = os.environ.get('SERVIR_ULTIMA_COPIA', '1') == '1'
+ultimas_copias = UltimasCopias(lambda indicador: serie_materializada(indicador), validade=VALIDADE_SERIES)
+
+# Cache das respostas JSON (LRU com TTL, memória limitada), chaveado pela consulta
+# normalizada e pelas versões dos dados; cachetools não é thread-safe, daí o lock
+cache_respostas = TTLCache(
+    maxsize=int(os.environ.get('CACHE_RESPOSTAS_TAMANHO', 512)),
+    ttl=int(os.environ.get('CACHE_RESPOSTAS_TTL', 300))
+)
+lock_cache_respostas = threading.Lock()
+MAX_AGE_RESPOSTAS = int(os.environ.get('MAX_AGE_RESPOSTAS', 60))
+
+# Limites da janela móvel (em meses) da rota de correlação
+JANELA_MINIMA_CORRELACAO = 3
+JANELA_MAXIMA_CORRELACAO = 120
+
+# Respostas menores que isso não compensam ser comprimidas (em bytes)
+TAMANHO_MINIMO_COMPRESSAO = 1024
+
+# Pool compartilhado para buscar os indicadores em paralelo
+executor_indicadores = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('MAX_WORKERS_INDICADORES', 8)),
+    thread_name_prefix='indicador'
+)
+
+# Tempo máximo (em segundos) que cada fonte pode levar antes de ser descartada
+TIMEOUT_FONTE = {
+    'bcb': 20,
+    'yfinance': 25,
+    'bigmac': 20,
+    'csv': 10,
+}
+
+def rotulo_indicador(indicador):
+    # Só indicadores conhecidos viram rótulo de métrica, para a cardinalidade ficar limitada
+    return indicador if indicador in INDICADORES else 'desconhecido'
+
+def fonte_do_indicador(indicador):
+    if indicador in arquivos_csv:
+        return 'csv'
+    if indicador == 'ibov':
+        return 'yfinance'
+    if indicador == 'bigmac':
+        return 'bigmac'
+    return 'bcb'
+
+def calcular_mensal(indicador):
+    # Série mensal final (acumulado e reamostragem incluídos) desde o início do histórico;
+    # attrs['obtida_em'] diz a hora real dos dados quando a fonte falhou
+    serie = serie_indicador(indicador, PERIODO_MATERIALIZADO)
+    mensal = para_mensal(serie)
+    if 'obtida_em' in serie.attrs:
+        mensal.attrs['obtida_em'] = serie.attrs['obtida_em']
+    return mensal
+
+def materializar_indicador(indicador):
+    # Calcula a série mensal final e a grava no snapshot compartilhado
+    serie = calcular_mensal(indicador)
+    if serie.empty:
+        # Fonte fora do ar: não sobrescreve o último artefato bom
+        anterior = materializados.ler(indicador)
+        return serie if anterior is None else anterior
     
-    try:
-        return retry_request(make_request)
-    except Exception as e:
-        print(f"Erro ao buscar dados do BCB para série {codigo_serie}: {str(e)}")
-        return []
+    materializados.salvar(indicador, serie)
+    return materializados.ler(indicador)
+
+def materializar_todos():
+    # Recalcula todos os indicadores em paralelo e troca o snapshot uma única vez;
+    # usado pelo script de atualização
+    inicio = time.monotonic()
+    calculadas = dict(zip(INDICADORES, executor_indicadores.map(calcular_mensal, INDICADORES)))
+    novas = {indicador: serie for indicador, serie in calculadas.items() if not serie.empty}
+    if novas:
+        materializados.salvar_varias(novas)
 
-def obter_dados_ibovespa(data_inicial, data_final):
+    resultados = {}
+    for indicador in INDICADORES:
+        # Fontes fora do ar mantêm o último artefato bom
+        serie = materializados.ler(indicador)
+        resultados[indicador] = calculadas[indicador] if serie is None else serie
+        situacao = 'atualizado' if indicador in novas else 'mantido (fonte sem dados)'
+        print(f"Materializado {indicador}: {len(resultados[indicador])} meses, {situacao}")
+    print(f"Materialização concluída em {time.monotonic() - inicio:.1f}s")
+    return resultados
+
+def serie_materializada(indicador):
+    # Usa o artefato em disco se estiver atual (inclusive o gravado por outro worker)
+    idade = materializados.idade(indicador)
+    atual = idade is not None and idade <= VALIDADE_SERIES
+    metricas.contar_cache('materializado', atual, indicador=rotulo_indicador(indicador))
+    if atual:
+        return materializados.ler(indicador)
+    return voos.executar(('materializar', indicador), materializar_indicador, indicador)
+
+def inicio_do_periodo(periodo, hoje):
+    # Período em meses (de 30 dias); 0 significa todo o histórico
+    if periodo == 0:
+        return INICIO_HISTORICO
+    return hoje - timedelta(days=periodo * 30)
+
+def recortar_periodo(serie, periodo_str):
+    data_inicial = inicio_do_periodo(int(periodo_str), datetime.now())
+    return serie[serie.index >= data_inicial]
+
+def carregar_serie(indicador, periodo_str):
     try:
-        print(f"Buscando dados do Ibovespa de {data_inicial} até {data_final}")
-        
-        ibov = yf.download(
-            '^BVSP',
-            start=data_inicial.strftime('%Y-%m-%d'),
-            end=data_final.strftime('%Y-%m-%d'),
-            interval='1d',
-            progress=False
-        )
-        
-        if ibov.empty:
-            print("Sem dados do Ibovespa")
-            return []
+        int(periodo_str)
+    except ValueError:
+        return serie_vazia()
+    if indicador not in INDICADORES:
+        return serie_vazia()
+    
+    with metricas.rotulos(indicador=rotulo_indicador(indicador), fonte=fonte_do_indicador(indicador)):
+        if SERVIR_ULTIMA_COPIA:
+            # Responde na hora com a última cópia boa; a atualização fica com a thread de fundo
+            metricas.contar_cache('ultimas_copias', ultimas_copias.versao(indicador) is not None)
+            serie = ultimas_copias.obter(indicador)
+        else:
+            serie = serie_materializada(indicador)
         
-        dados = []
-        for index, row in ibov.iterrows():
+        if serie is None:
+            return serie_vazia()
+        with metricas.etapa('transformacao'):
+            return recortar_periodo(serie, periodo_str)
+
+def frescor_indicadores(indicadores, periodo_str):
+    if not SERVIR_ULTIMA_COPIA:
+        return None
+    return {indicador.upper(): ultimas_copias.frescor(indicador) for indicador in indicadores}
+
+def series_indicadores_concorrente(indicadores, periodo_str):
+    """Carrega vários indicadores em paralelo, cada um limitado ao timeout da sua fonte"""
+    if metricas.coletando():
+        # Requisição perfilada: carrega tudo nesta thread, que é a única que o cProfile vê
+        return {indicador: carregar_serie(indicador, periodo_str) for indicador in dict.fromkeys(indicadores)}
+    
+    inicio = time.monotonic()
+    futuros = {
+        indicador: executor_indicadores.submit(carregar_serie, indicador, periodo_str)
+        for indicador in dict.fromkeys(indicadores)
+    }
+    
+    resultados = {}
+    for indicador, futuro in futuros.items():
+        # O orçamento conta a partir do disparo, então as fontes correm em paralelo
+        limite = TIMEOUT_FONTE[fonte_do_indicador(indicador)]
+        restante = max(0, limite - (time.monotonic() - inicio))
+        try:
+            resultados[indicador] = futuro.result(timeout=restante)
+        except FuturesTimeoutError:
+            logger.warning(f"Timeout de {limite}s excedido ao buscar {indicador}")
+            resultados[indicador] = serie_vazia()
+    
+    return resultados
+
+def buscar_bcb(codigo_serie, data_inicial, data_final):
+    url = f"{BCB_API_URL}/dados/serie/bcdata.sgs.{codigo_serie}/dados"
+    params = {
+        'formato': 'json',
+        'dataInicial': data_inicial.strftime('%d/%m/%Y'),
+        'dataFinal': data_final.strftime('%d/%m/%Y')
+    }
+    
+    response = http_get(url, params=params)
+    # O SGS responde 404 quando não há nenhum valor na janela pedida
+    if response.status_code == 404:
+        return []
+    response.raise_for_status()
+    return response.json()
+
+def fatiar_janela(inicio, fim, anos=ANOS_POR_CONSULTA_BCB, do_fim_para_o_inicio=False):
+    # Divide [inicio, fim] em janelas consecutivas de no máximo `anos` anos
+    fatias = []
+    while inicio <= fim:
+        try:
+            proximo = inicio.replace(year=inicio.year + anos)
+        except ValueError:
+            # 29/02 sem correspondente no ano de destino
+            proximo = inicio.replace(year=inicio.year + anos, day=28)
+        fatias.append((inicio, min(fim, proximo - timedelta(days=1))))
+        inicio = proximo
+    return fatias[::-1] if do_fim_para_o_inicio else fatias
+
+def sincronizar_serie_bcb(codigo_serie, data_inicial, data_final):
+    # Baixa só o que falta: o começo ainda não coberto e os dias após a última observação
+    cobertura = series_store.cobertura(codigo_serie)
+    for inicio, fim in series_store.janelas_pendentes(codigo_serie, data_inicial, data_final):
+        if inicio > fim:
+            # Nada novo a pedir, mas registra a sincronização
+            series_store.salvar(codigo_serie, [], fim, fim)
+            continue
+        
+        # Cada fatia é gravada assim que chega, a partir da ponta já coberta, para que a
+        # cobertura continue contígua se uma fatia falhar no meio do backfill
+        para_tras = cobertura is None or fim.strftime('%Y-%m-%d') < cobertura[0]
+        for inicio_fatia, fim_fatia in fatiar_janela(inicio, fim, do_fim_para_o_inicio=para_tras):
+            dados = buscar_bcb(codigo_serie, inicio_fatia, fim_fatia)
+            series_store.salvar(codigo_serie, dados, inicio_fatia, fim_fatia)
+            logger.info(f"Série {codigo_serie}: {len(dados)} registros novos de {inicio_fatia:%d/%m/%Y} até {fim_fatia:%d/%m/%Y}")
+
+def sincronizar_series_bcb(data_inicial, data_final):
+    # Atualiza incrementalmente todas as séries do SGS mapeadas em codigos_bcb
+    for indicador, codigo in codigos_bcb.items():
+        if isinstance(codigo, int):
             try:
-                close_value = float(row['Close'])
-                dados.append({
-                    'data': index.strftime('%d/%m/%Y'),
-                    'valor': str(close_value)
-                })
+                sincronizar_serie_bcb(codigo, data_inicial, data_final)
             except Exception as e:
-                print(f"Erro ao processar linha: {e}")
-                continue
-        
-        return dados
-    except Exception as e:
-        print(f"Erro ao buscar dados do Ibovespa: {str(e)}")
-        return []
+                logger.error(f"Erro ao sincronizar {indicador} (série {codigo}): {str(e)}")
 
-def obter_dados_cesta_basica(data_inicial, data_final):
+def obter_dados_bcb_cached(codigo_serie, data_inicial_str, data_final_str, mensal=False):
+    data_inicial = datetime.strptime(data_inicial_str, '%d/%m/%Y')
+    data_final = datetime.strptime(data_final_str, '%d/%m/%Y')
+    
+    falhou = False
     try:
-        print(f"Buscando dados da cesta básica...")
+        # Chamadas simultâneas para a mesma série esperam uma única busca no BCB. Quem
+        # pediu uma janela maior que a do líder confere e, se faltar algo, busca de novo.
+        for tentativa in range(2):
+            if not series_store.precisa_buscar(codigo_serie, data_inicial, data_final):
+                if tentativa == 0:
+                    metricas.contar_cache('historico_bcb', True)
+                break
+            if tentativa == 0:
+                metricas.contar_cache('historico_bcb', False)
+            voos.executar(('bcb', codigo_serie), sincronizar_serie_bcb, codigo_serie, data_inicial, data_final)
+    except Exception as e:
+        # Sem acesso ao BCB, responde com o que já houver no histórico local
+        logger.error(f"Erro ao buscar dados do BCB para série {codigo_serie}: {str(e)}")
+        falhou = True
+    
+    with metricas.etapa('parse'):
+        # mensal=True traz só a última observação de cada mês (agregada no SQLite)
+        if mensal:
+            linhas = series_store.consultar_mensal(codigo_serie, data_inicial, data_final)
+        else:
+            linhas = series_store.consultar(codigo_serie, data_inicial, data_final)
+        if not linhas:
+            return serie_vazia()
         
-        url = "https://raw.githubusercontent.com/GugaCasanova/Comparador_Indexadores/main/data/cesta_basica.csv"
+        datas, valores = zip(*linhas)
+        serie = criar_serie(pd.to_datetime(datas, format='%Y-%m-%d'), valores)
+    
+    if falhou:
+        # O histórico local vale como dado da última sincronização bem-sucedida, não
+        # como dado novo; assim a cópia servida aparece como desatualizada
+        cobertura = series_store.cobertura(codigo_serie)
+        if cobertura is not None:
+            serie.attrs['obtida_em'] = cobertura[2]
+    return serie
+
+def obter_ibovespa_csv(inicio, fim, intervalo):
+    # Fonte alternativa ao yfinance (IBOV_CSV_URL), no formato Date,Close
+    response = http_get(IBOV_CSV_URL, params={'inicio': inicio, 'fim': fim, 'intervalo': intervalo})
+    response.raise_for_status()
+    with metricas.etapa('parse'):
+        df = pd.read_csv(StringIO(response.text), usecols=['Date', 'Close'], parse_dates=['Date'])
+        df = df[(df['Date'] >= inicio) & (df['Date'] < fim)]
+        return criar_serie(df['Date'], df['Close'])
+
+def serie_fechamento(ibov):
+    # Versões novas do yfinance devolvem colunas em MultiIndex (campo, ticker)
+    close = ibov['Close']
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    
+    return criar_serie(close.index, close.to_numpy())
+
+def obter_dados_ibovespa(data_inicial, data_final, intervalo='1d'):
+    try:
+        logger.debug(f"Buscando dados do Ibovespa de {data_inicial} até {data_final}")
         
-        # Lê o CSV
-        df = pd.read_csv(url)
-        df['data'] = pd.to_datetime(df['data'])
-        df = df.sort_values('data')
+        if IBOV_CSV_URL:
+            inicio = data_inicial.strftime('%Y-%m-%d')
+            fim = data_final.strftime('%Y-%m-%d')
+            return voos.executar(('ibov_csv', inicio, fim, intervalo), obter_ibovespa_csv, inicio, fim, intervalo)
         
-        # Filtra pelo período
-        mask = (df['data'] >= data_inicial) & (df['data'] <= data_final)
-        df_filtrado = df.loc[mask]
+        # Import tardio: o yfinance é pesado e só esta rota usa
+        import yfinance as yf
         
-        # Converte para o formato esperado
-        dados = []
-        for _, row in df_filtrado.iterrows():
-            dados.append({
-                'data': row['data'].strftime('%d/%m/%Y'),
-                'valor': str(row['valor'])
-            })
+        inicio = data_inicial.strftime('%Y-%m-%d')
+        fim = data_final.strftime('%Y-%m-%d')
+        with metricas.etapa('busca'):
+            ibov = voos.executar(
+                ('yfinance', '^BVSP', inicio, fim, intervalo),
+                yf.download, '^BVSP', start=inicio, end=fim, interval=intervalo, progress=False
+            )
         
-        return dados
+        if ibov.empty:
+            logger.warning("Sem dados do Ibovespa")
+            return serie_vazia()
         
+        return serie_fechamento(ibov)
     except Exception as e:
-        print(f"Erro ao buscar dados da Cesta Básica: {str(e)}")
-        return []
+        logger.error(f"Erro ao buscar dados do Ibovespa: {str(e)}")
+        return serie_vazia()
+
+def extrair_bigmac_brasil(conteudo):
+    # O arquivo completo traz todos os países; guarda só as colunas e linhas do Brasil
+    df = pd.read_csv(StringIO(conteudo), usecols=['date', 'iso_a3', 'local_price'])
+    return df[df['iso_a3'] == 'BRA'].to_csv(index=False)
 
 def obter_dados_bigmac(data_inicial, data_final):
     try:
-        print(f"Buscando dados do Big Mac de {data_inicial.strftime('%d/%m/%Y')} até {data_final.strftime('%d/%m/%Y')}...")
+        logger.debug(f"Buscando dados do Big Mac de {data_inicial.strftime('%d/%m/%Y')} até {data_final.strftime('%d/%m/%Y')}...")
         
         # URL do dataset oficial do The Economist no GitHub
-        url = "https://raw.githubusercontent.com/TheEconomist/big-mac-data/master/output-data/big-mac-full-index.csv"
-        
-        # Lê o CSV
-        df = pd.read_csv(url)
+        url = BIGMAC_URL
         
-        # Filtra apenas dados do Brasil
-        df = df[df['iso_a3'] == 'BRA']
+        # Lê o CSV: o cache guarda só o recorte do Brasil e revalida por ETag,
+        # então na maioria das chamadas o custo é uma resposta 304 sem parsing
+        df = cache_http.obter_dataframe(url, 'bigmac_brasil', filtrar=extrair_bigmac_brasil)
         
         # Converte data e valor
         df['data'] = pd.to_datetime(df['date'])
@@ -154,323 +450,268 @@ def obter_dados_bigmac(data_inicial, data_final):
         # Remove valores nulos após o preenchimento
         df_completo = df_completo.dropna(subset=['valor'])
         
-        # Converte para o formato esperado
-        dados = []
-        for _, row in df_completo.iterrows():
-            dados.append({
-                'data': row['data'].strftime('%d/%m/%Y'),
-                'valor': str(row['valor'])
-            })
-        
-        print(f"Dados obtidos: {len(dados)} registros")
-        if dados:
-            print(f"Período: de {dados[0]['data']} até {dados[-1]['data']}")
-            print(f"Valores: de R$ {float(dados[0]['valor']):.2f} até R$ {float(dados[-1]['valor']):.2f}")
-        
-        return dados
-        
-    except Exception as e:
-        print(f"Erro ao buscar dados do Big Mac: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        return []
-
-def obter_dados_fipezap(data_inicial, data_final):
-    try:
-        print(f"Buscando dados do FipeZap para período {data_inicial} até {data_final}...")
-        
-        url = "https://raw.githubusercontent.com/GugaCasanova/Comparador_Indexadores/main/data/fipezap.csv"
-        
-        # Faz a requisição com timeout e verifica o status
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        content = response.text
-        if not content.strip():
-            print("URL retornou conteúdo vazio")
-            return []
-            
-        # Verifica se o conteúdo parece ser um CSV válido
-        if ',' not in content and ';' not in content:
-            print("Conteúdo não parece ser um CSV válido")
-            print(f"Primeiros 100 caracteres: {content[:100]}")
-            return []
-        
-        # Tenta diferentes separadores e encodings
-        for sep in [',', ';']:
-            try:
-                df = pd.read_csv(StringIO(content), sep=sep)
-                if not df.empty:
-                    break
-            except:
-                continue
-        
-        if df.empty:
-            print("Não foi possível carregar dados válidos do CSV")
-            return []
-        
-        # Resto do processamento
-        df['data'] = pd.to_datetime(df['data'])
-        df = df.sort_values('data')
-        
-        mask = (df['data'] >= data_inicial) & (df['data'] <= data_final)
-        df_filtrado = df.loc[mask]
-        
-        dados = []
-        for _, row in df_filtrado.iterrows():
-            dados.append({
-                'data': row['data'].strftime('%d/%m/%Y'),
-                'valor': str(row['valor'])
-            })
-        
-        print(f"Processados {len(dados)} registros do FipeZap")
-        return dados
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Erro na requisição HTTP: {e}")
-        return []
-    except Exception as e:
-        print(f"Erro ao processar dados do FipeZap: {e}")
-        import traceback
-        print(traceback.format_exc())
-        return []
-
-def obter_dados_gasolina(data_inicial, data_final):
-    try:
-        print(f"Buscando dados da gasolina para período {data_inicial} até {data_final}...")
-        
-        # URL do arquivo CSV com dados da gasolina
-        url = "https://raw.githubusercontent.com/GugaCasanova/Comparador_Indexadores/main/data/gasolina.csv"
-        
-        # Faz a requisição com timeout
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        content = response.text
-        if not content.strip():
-            print("URL retornou conteúdo vazio")
-            return []
+        serie = criar_serie(df_completo['data'], df_completo['valor'])
         
-        # Lê o CSV
-        df = pd.read_csv(StringIO(content))
-        df['data'] = pd.to_datetime(df['data'])
-        df = df.sort_values('data')
-        
-        # Filtra pelo período
-        mask = (df['data'] >= data_inicial) & (df['data'] <= data_final)
-        df_filtrado = df.loc[mask]
-        
-        if df_filtrado.empty:
-            print("Nenhum dado encontrado para o período especificado")
-            return []
-        
-        # Converte para o formato esperado
-        dados = []
-        for _, row in df_filtrado.iterrows():
-            dados.append({
-                'data': row['data'].strftime('%d/%m/%Y'),
-                'valor': str(row['valor'])
-            })
+        logger.debug(f"Dados obtidos: {len(serie)} registros")
+        if not serie.empty and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Período: de {serie.index[0]:%d/%m/%Y} até {serie.index[-1]:%d/%m/%Y}")
+            logger.debug(f"Valores: de R$ {serie.iloc[0]:.2f} até R$ {serie.iloc[-1]:.2f}")
         
-        print(f"Processados {len(dados)} registros da gasolina")
-        return dados
+        return serie
         
     except Exception as e:
-        print(f"Erro ao buscar dados da Gasolina: {str(e)}")
-        return []
+        logger.exception(f"Erro ao buscar dados do Big Mac: {str(e)}")
+        return serie_vazia()
 
-def obter_dados_energia(data_inicial, data_final):
-    try:
-        print(f"Buscando dados de energia para período {data_inicial} até {data_final}...")
-        
-        # URL do arquivo CSV com dados da energia
-        url = "https://raw.githubusercontent.com/GugaCasanova/Comparador_Indexadores/main/data/energia.csv"
-        
-        # Faz a requisição com timeout
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        content = response.text
-        if not content.strip():
-            print("URL retornou conteúdo vazio")
-            return []
-        
-        # Lê o CSV
-        df = pd.read_csv(StringIO(content))
-        df['data'] = pd.to_datetime(df['data'])
-        df = df.sort_values('data')
-        
-        # Filtra pelo período
-        mask = (df['data'] >= data_inicial) & (df['data'] <= data_final)
-        df_filtrado = df.loc[mask]
-        
-        if df_filtrado.empty:
-            print("Nenhum dado encontrado para o período especificado")
-            return []
-        
-        # Converte para o formato esperado
-        dados = []
-        for _, row in df_filtrado.iterrows():
-            dados.append({
-                'data': row['data'].strftime('%d/%m/%Y'),
-                'valor': str(row['valor'])
-            })
-        
-        print(f"Processados {len(dados)} registros de energia")
-        return dados
-        
-    except Exception as e:
-        print(f"Erro ao buscar dados de Energia: {str(e)}")
-        return []
+def serie_indicador(indicador, periodo_str):
+    # As etapas medidas durante o carregamento levam o indicador e a fonte como rótulos
+    with metricas.rotulos(indicador=rotulo_indicador(indicador), fonte=fonte_do_indicador(indicador)):
+        return calcular_serie_indicador(indicador, periodo_str)
 
-def processar_dados_indicador(indicador, periodo_str):
+def calcular_serie_indicador(indicador, periodo_str):
     hoje = datetime.now()
     periodo = int(periodo_str)
-    data_inicial = hoje - timedelta(days=periodo * 30)
+    data_inicial = inicio_do_periodo(periodo, hoje)
     data_final = hoje
     
     try:
-        if indicador in ['energia', 'cesta', 'gasolina', 'fipezap', 'plano_saude']:
-            # Mapeia os nomes dos arquivos
-            arquivo_map = {
-                'energia': 'energia.csv',
-                'cesta': 'cesta_basica.csv',
-                'gasolina': 'gasolina.csv',
-                'fipezap': 'fipezap.csv',
-                'plano_saude': 'plano_saude.csv'
-            }
-            
-            # Se for plano_saude, usa URL completa do GitHub
-            arquivo = codigos_bcb[indicador] if indicador == 'plano_saude' else arquivo_map[indicador]
+        if indicador in arquivos_csv:
+            # Recorta a série já carregada na memória (relida só se o arquivo mudar)
+            with metricas.etapa('busca'):
+                serie = registro_csv.fatia(arquivos_csv[indicador], data_inicial, data_final)
             
-            # Lê o CSV (local ou do GitHub)
-            if indicador == 'plano_saude':
-                df = pd.read_csv(arquivo)
-            else:
-                df = pd.read_csv(f'data/{arquivo}')
-            
-            df['data'] = pd.to_datetime(df['data'])
-            
-            # Ajusta as datas para o último dia do mês
-            df['data'] = df['data'].apply(lambda x: x + pd.offsets.MonthEnd(0))
-            
-            # Filtra pelo período
-            mask = (df['data'] >= data_inicial) & (df['data'] <= data_final)
-            df = df.loc[mask]
-            
-            if df.empty:
-                print(f"Nenhum dado de {indicador} encontrado para o período")
-                return [], []
-            
-            # Ordena por data
-            df = df.sort_values('data')
-            
-            print(f"Processando {indicador}: {len(df)} registros encontrados")
-            print(f"Período: de {df['data'].min()} até {df['data'].max()}")
-            print(f"Valores: de {df['valor'].min():.2f} até {df['valor'].max():.2f}")
+            if serie.empty:
+                logger.debug(f"Nenhum dado de {indicador} encontrado para o período")
+                return serie_vazia()
             
-            # Converte para o formato esperado
-            datas = df['data'].dt.strftime('%Y-%m-%d').tolist()
-            valores = df['valor'].tolist()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"Processando {indicador}: {len(serie)} registros de {serie.index.min()} até {serie.index.max()}, "
+                    f"valores de {serie.min():.2f} até {serie.max():.2f}"
+                )
             
-            return datas, valores
+            return serie
             
         elif indicador == 'aluguel':
             data_inicial_str = data_inicial.strftime('%d/%m/%Y')
             data_final_str = data_final.strftime('%d/%m/%Y')
-            dados = obter_dados_bcb_cached(codigos_bcb[indicador], data_inicial_str, data_final_str)
+            serie = obter_dados_bcb_cached(codigos_bcb[indicador], data_inicial_str, data_final_str, mensal=True)
             
-            if not dados:
-                print(f"Nenhum dado retornado para {indicador}")
-                return [], []
+            if serie.empty:
+                logger.debug(f"Nenhum dado retornado para {indicador}")
+                return serie_vazia()
             
-            df = pd.DataFrame(dados)
-            df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y')
-            df['valor'] = pd.to_numeric(df['valor'].str.replace(',', '.'), errors='coerce')
-            df = df.dropna()
-            df = df.sort_values('data')
-            
-            datas = df['data'].dt.strftime('%Y-%m-%d').tolist()
-            valores = df['valor'].tolist()
-            
-            return datas, valores
+            return serie
             
         else:
             # Para IPCA e IGP-M, pega 12 meses a mais para calcular o acumulado
+            data_busca = data_inicial
             if indicador in ['ipca', 'igpm']:
-                data_inicial = data_inicial - timedelta(days=365)
+                data_busca = data_inicial - timedelta(days=365)
                 
-            data_inicial_str = data_inicial.strftime('%d/%m/%Y')
+            data_inicial_str = data_busca.strftime('%d/%m/%Y')
             data_final_str = data_final.strftime('%d/%m/%Y')
             
             if indicador == 'bigmac':
-                dados = obter_dados_bigmac(data_inicial, data_final)
-            elif indicador == 'cesta':
-                dados = obter_dados_cesta_basica(data_inicial, data_final)
+                serie = obter_dados_bigmac(data_busca, data_final)
             elif indicador == 'ibov':
-                dados = obter_dados_ibovespa(data_inicial, data_final)
+                # Barras mensais: o fechamento de cada mês é o que o gráfico usa
+                serie = obter_dados_ibovespa(data_busca, data_final, intervalo='1mo')
             else:
-                dados = obter_dados_bcb_cached(codigos_bcb[indicador], data_inicial_str, data_final_str)
-            
-            if not dados:
-                print(f"Nenhum dado retornado para {indicador}")
-                return [], []
-            
-            df = pd.DataFrame(dados)
-            df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y')
-            df['valor'] = pd.to_numeric(df['valor'].str.replace(',', '.'), errors='coerce')
-            df = df.dropna()
-            df = df.set_index('data')
-            
-            # Tratamento especial para IPCA e IGP-M (acumulado 12 meses)
-            if indicador in ['ipca', 'igpm']:
-                df['valor_acum'] = (1 + df['valor']/100).rolling(window=12).apply(lambda x: np.prod(x) - 1) * 100
-                df = df.dropna()
-                df['valor'] = df['valor_acum']
+                # Só o último valor de cada mês sai do histórico local, mesmo em séries diárias
+                serie = obter_dados_bcb_cached(codigos_bcb[indicador], data_inicial_str, data_final_str, mensal=True)
             
-            # Agrupa por mês pegando o último valor
-            df = df.resample('ME').last()
-            df = df.dropna()
+            if serie.empty:
+                logger.debug(f"Nenhum dado retornado para {indicador}")
+                return serie_vazia()
+            obtida_em = serie.attrs.get('obtida_em')
             
-            # Filtra pelo período solicitado
-            df = df[df.index >= data_inicial]
-            
-            if df.empty:
-                print(f"Sem dados para o período solicitado: {indicador}")
-                return [], []
+            with metricas.etapa('transformacao'):
+                # Tratamento especial para IPCA e IGP-M (acumulado 12 meses)
+                if indicador in ['ipca', 'igpm']:
+                    serie = acumular_percentual(serie, janela=12).dropna()
+                
+                # Agrupa por mês pegando o último valor
+                serie = serie.resample('ME').last().dropna()
+                
+                # Filtra pelo período solicitado, descartando os meses usados só no acumulado
+                serie = serie[serie.index >= data_inicial]
             
-            datas = df.index.strftime('%Y-%m-%d').tolist()
-            valores = df['valor'].tolist()
+            if serie.empty:
+                logger.debug(f"Sem dados para o período solicitado: {indicador}")
+                return serie_vazia()
             
-            return datas, valores
+            if obtida_em is not None:
+                serie.attrs['obtida_em'] = obtida_em
+            return serie
             
     except Exception as e:
-        print(f"Erro ao processar dados de {indicador}: {str(e)}")
-        return [], []
+        logger.error(f"Erro ao processar dados de {indicador}: {str(e)}")
+        return serie_vazia()
+
+def processar_dados_indicador(indicador, periodo_str):
+    return serie_para_listas(serie_indicador(indicador, periodo_str))
+
+def ler_max_points():
+    # Parâmetro opcional max_points: limita os pontos por resposta (mínimo 3)
+    valor = request.args.get('max_points', '')
+    if not valor:
+        return None
+    max_pontos = int(valor)
+    if max_pontos < 3:
+        raise ValueError('max_points deve ser pelo menos 3')
+    return max_pontos
+
+def cabe_no_binario(tabela, max_pontos):
+    # O formato binário traz todos os meses do eixo, sem como pular linhas; se max_points
+    # pede menos pontos que isso, a resposta sai reduzida em JSON (o Accept do cliente
+    # também aceita JSON)
+    return not max_pontos or len(tabela) <= max_pontos
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def versao_indicador(indicador):
+    # Muda sempre que a série servida para o indicador muda
+    if SERVIR_ULTIMA_COPIA:
+        return ultimas_copias.versao(indicador)
+    return materializados.versao(indicador)
+
+def negociar_formato():
+    # ?formato=binario ou Accept: application/x-comparador-series pedem o formato colunar
+    if request.args.get('formato') == 'binario':
+        return 'binario'
+    if request.accept_mimetypes.best_match(['application/json', MIMETYPE_BINARIO]) == MIMETYPE_BINARIO:
+        return 'binario'
+    return 'json'
+
+def negociar_compressao():
+    aceitas = request.accept_encodings
+    if brotli is not None and aceitas['br']:
+        return 'br'
+    if aceitas['gzip']:
+        return 'gzip'
+    return None
+
+def comprimir(corpo, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(corpo, quality=5)
+    return gzip.compress(corpo, compresslevel=6)
+
+def responder_com_cache(chave_consulta, indicadores, gerar):
+    """
+    Serve o corpo de gerar(formato) a partir do cache de respostas, chaveado pela
+    consulta normalizada, pelo formato e pelas versões dos dados dos indicadores
+    envolvidos. Comprime com brotli/gzip quando o cliente aceita (guardando a versão
+    comprimida junto), responde com ETag forte e Cache-Control e devolve 304 quando
+    o If-None-Match bate.
+    """
+    formato = negociar_formato()
+    versoes = tuple(versao_indicador(indicador) for indicador in indicadores)
+    chave = (chave_consulta, formato, versoes)
+    entrada = None
+    if None not in versoes:
+        with lock_cache_respostas:
+            entrada = cache_respostas.get(chave)
+    metricas.contar_cache('respostas', entrada is not None, indicador='')
+    
+    if entrada is None:
+        with metricas.rotulos(indicador='', fonte='resposta'):
+            corpo, mimetype = gerar(formato)
+        if isinstance(corpo, str):
+            corpo = corpo.encode('utf-8')
+        entrada = {
+            'corpo': corpo,
+            'mimetype': mimetype,
+            'etag': hashlib.sha1(corpo).hexdigest(),
+            'comprimidos': {}
+        }
+        
+        # Só guarda se os dados não mudaram enquanto a resposta era montada
+        versoes_depois = tuple(versao_indicador(indicador) for indicador in indicadores)
+        if None not in versoes_depois and versoes_depois == versoes:
+            with lock_cache_respostas:
+                cache_respostas[chave] = entrada
+    
+    corpo = entrada['corpo']
+    etag = entrada['etag']
+    codificacao = negociar_compressao() if len(corpo) >= TAMANHO_MINIMO_COMPRESSAO else None
+    if codificacao:
+        comprimido = entrada['comprimidos'].get(codificacao)
+        if comprimido is None:
+            with metricas.etapa('compressao', indicador='', fonte='resposta'):
+                comprimido = entrada['comprimidos'][codificacao] = comprimir(corpo, codificacao)
+        corpo = comprimido
+        # Cada codificação é uma representação diferente, com ETag própria
+        etag = f'{etag}-{codificacao}'
+    
+    resposta = app.response_class(corpo, mimetype=entrada['mimetype'])
+    if codificacao:
+        resposta.headers['Content-Encoding'] = codificacao
+    resposta.headers['Vary'] = 'Accept, Accept-Encoding'
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = f'public, max-age={MAX_AGE_RESPOSTAS}'
+    return resposta.make_conditional(request)
+
+def json_dados(tabela, metadados):
+    # Corpo JSON de /dados: o eixo de datas e uma lista de valores por indicador
+    return app.json.dumps({
+        'datas': tabela.index.strftime('%Y-%m-%d').tolist(),
+        'valores1': valores_para_json(tabela[1].to_numpy()),
+        'valores2': valores_para_json(tabela[2].to_numpy()),
+        **metadados
+    })
+
 @app.route('/dados')
 def dados():
     try:
-        indicador1 = request.args.get('indicador1', 'selic')
-        indicador2 = request.args.get('indicador2', 'ipca')
-        periodo = request.args.get('periodo', '12')
-        
-        datas1, valores1 = processar_dados_indicador(indicador1, periodo)
-        datas2, valores2 = processar_dados_indicador(indicador2, periodo)
+        indicador1 = request.args.get('indicador1', 'selic').strip().lower()
+        indicador2 = request.args.get('indicador2', 'ipca').strip().lower()
+        periodo = request.args.get('periodo', '12').strip()
+        alinhamento = request.args.get('alinhamento', 'outer')
+        # Nomes desconhecidos não chegam ao cache de cópias nem ao atualizador de fundo
+        desconhecidos = [indicador for indicador in (indicador1, indicador2) if indicador not in INDICADORES]
+        if desconhecidos:
+            return jsonify({'erro': f'Indicadores desconhecidos: {", ".join(desconhecidos)}'}), 400
+        if alinhamento not in POLITICAS_ALINHAMENTO:
+            alinhamento = 'outer'
+        try:
+            max_pontos = ler_max_points()
+        except ValueError:
+            max_pontos = None
+        if periodo.isdigit():
+            periodo = str(int(periodo))
+        bytes_por_valor = 4 if request.args.get('precisao') == '32' else 8
+        
+        def gerar(formato):
+            series = series_indicadores_concorrente([indicador1, indicador2], periodo)
+            
+            # Casa as duas séries pelo mês de calendário, em vez de parear por posição
+            with metricas.etapa('transformacao'):
+                tabela = alinhar_series({1: series[indicador1], 2: series[indicador2]}, alinhamento)
+            metadados = {
+                'indicador1': indicador1.upper(),
+                'indicador2': indicador2.upper(),
+                'atualizacao': frescor_indicadores([indicador1, indicador2], periodo)
+            }
+            
+            if formato == 'binario' and cabe_no_binario(tabela, max_pontos):
+                with metricas.etapa('serializacao'):
+                    corpo = codificar_series(tabela, [indicador1.upper(), indicador2.upper()], metadados, bytes_por_valor)
+                return corpo, MIMETYPE_BINARIO
+            
+            if max_pontos:
+                with metricas.etapa('transformacao'):
+                    tabela = reduzir_pontos(tabela, max_pontos)
+            
+            with metricas.etapa('serializacao'):
+                return json_dados(tabela, metadados), 'application/json'
         
-        return jsonify({
-            'datas': datas1,
-            'valores1': valores1,
-            'valores2': valores2,
-            'indicador1': indicador1.upper(),
-            'indicador2': indicador2.upper()
-        })
+        chave = ('dados', indicador1, indicador2, periodo, alinhamento, max_pontos, bytes_por_valor)
+        return responder_com_cache(chave, [indicador1, indicador2], gerar)
     except Exception as e:
-        print(f"Erro na rota /dados: {str(e)}")
+        logger.exception(f"Erro na rota /dados: {str(e)}")
         return jsonify({
             'datas': [],
             'valores1': [],
@@ -479,50 +720,242 @@ def dados():
             'indicador2': indicador2.upper() if 'indicador2' in locals() else ''
         })
 
-def testar_acesso_cesta():
-    url = "https://raw.githubusercontent.com/GugaCasanova/Comparador_Indexadores/main/data/cesta_basica.csv"
+@app.route('/dados/lote')
+def dados_lote():
+    periodo = request.args.get('periodo', '12')
+    alinhamento = request.args.get('alinhamento', 'outer')
     
+    # Aceita tanto ?indicadores=selic,ipca,cdi quanto ?indicadores=selic&indicadores=ipca
+    indicadores = list(dict.fromkeys(
+        indicador.strip().lower()
+        for valor in request.args.getlist('indicadores')
+        for indicador in valor.split(',')
+        if indicador.strip()
+    ))
+    
+    if not indicadores:
+        return jsonify({'erro': 'Informe ao menos um indicador em "indicadores"'}), 400
+    if len(indicadores) > MAX_INDICADORES_LOTE:
+        return jsonify({'erro': f'No máximo {MAX_INDICADORES_LOTE} indicadores por requisição'}), 400
+    desconhecidos = [indicador for indicador in indicadores if indicador not in INDICADORES]
+    if desconhecidos:
+        return jsonify({'erro': f'Indicadores desconhecidos: {", ".join(desconhecidos)}'}), 400
+    if not periodo.isdigit():
+        return jsonify({'erro': 'Período inválido'}), 400
+    if alinhamento not in POLITICAS_ALINHAMENTO:
+        return jsonify({'erro': f'Alinhamento deve ser um de: {", ".join(POLITICAS_ALINHAMENTO)}'}), 400
     try:
-        print("Testando acesso à URL...")
-        response = requests.get(url)
-        print(f"Status code: {response.status_code}")
-        print("Conteúdo da resposta:", response.text[:200])
-        
-        if response.status_code == 404:
-            print("Arquivo não encontrado. Verifique se o caminho está correto.")
-            return
-            
-        print("\nTentando ler como DataFrame...")
-        df = pd.read_csv(url)
-        print("\nPrimeiras linhas:")
-        print(df.head())
+        max_pontos = ler_max_points()
+    except ValueError:
+        return jsonify({'erro': 'max_points deve ser um inteiro maior ou igual a 3'}), 400
+    
+    periodo = str(int(periodo))
+    bytes_por_valor = 4 if request.args.get('precisao') == '32' else 8
+    
+    def gerar(formato):
+        # Cada fonte distinta é carregada uma única vez, em paralelo
+        series = series_indicadores_concorrente(indicadores, periodo)
+        with metricas.etapa('transformacao'):
+            tabela = alinhar_series(series, alinhamento)
+        metadados = {
+            'indicadores': [indicador.upper() for indicador in indicadores],
+            'periodo': periodo,
+            'alinhamento': alinhamento,
+            'atualizacao': frescor_indicadores(indicadores, periodo)
+        }
         
+        if formato == 'binario' and cabe_no_binario(tabela, max_pontos):
+            with metricas.etapa('serializacao'):
+                tabela = tabela.reindex(columns=indicadores)
+                corpo = codificar_series(tabela, metadados['indicadores'], metadados, bytes_por_valor)
+            return corpo, MIMETYPE_BINARIO
+        
+        if max_pontos:
+            with metricas.etapa('transformacao'):
+                tabela = reduzir_pontos(tabela, max_pontos)
+        
+        with metricas.etapa('serializacao'):
+            return app.json.dumps({
+                'datas': tabela.index.strftime('%Y-%m-%d').tolist(),
+                'series': {
+                    indicador.upper(): valores_para_json(tabela[indicador].to_numpy()) if indicador in tabela else []
+                    for indicador in indicadores
+                },
+                **metadados
+            }), 'application/json'
+    
+    try:
+        chave = ('lote', tuple(indicadores), periodo, alinhamento, max_pontos, bytes_por_valor)
+        return responder_com_cache(chave, indicadores, gerar)
     except Exception as e:
-        print(f"Erro: {str(e)}")
+        logger.exception(f"Erro na rota /dados/lote: {str(e)}")
+        return jsonify({'erro': 'Erro ao processar os indicadores'}), 500
 
-def testar_acesso_fipezap():
-    url = "https://raw.githubusercontent.com/GugaCasanova/Comparador_Indexadores/main/data/fipezap.csv"
+@app.route('/analise/correlacao')
+def analise_correlacao():
+    indicador1 = request.args.get('indicador1', 'cdi').strip().lower()
+    indicador2 = request.args.get('indicador2', 'ipca').strip().lower()
+    periodo = request.args.get('periodo', '60').strip()
+    janela = request.args.get('janela', '12').strip()
     
+    desconhecidos = [indicador for indicador in (indicador1, indicador2) if indicador not in INDICADORES]
+    if desconhecidos:
+        return jsonify({'erro': f'Indicadores desconhecidos: {", ".join(desconhecidos)}'}), 400
+    if not periodo.isdigit():
+        return jsonify({'erro': 'Período inválido'}), 400
+    if not janela.isdigit() or not JANELA_MINIMA_CORRELACAO <= int(janela) <= JANELA_MAXIMA_CORRELACAO:
+        return jsonify({
+            'erro': f'janela deve ser um inteiro entre {JANELA_MINIMA_CORRELACAO} e {JANELA_MAXIMA_CORRELACAO} meses'
+        }), 400
     try:
-        print("Testando acesso à URL do FipeZap...")
-        response = requests.get(url)
-        print(f"Status code: {response.status_code}")
-        print("Conteúdo da resposta:", response.text[:200])
+        max_pontos = ler_max_points()
+    except ValueError:
+        return jsonify({'erro': 'max_points deve ser um inteiro maior ou igual a 3'}), 400
+    
+    periodo = str(int(periodo))
+    janela = int(janela)
+    bytes_por_valor = 4 if request.args.get('precisao') == '32' else 8
+    
+    def gerar(formato):
+        # Carrega janela meses a mais para que o primeiro mês do período já tenha janela cheia
+        periodo_busca = periodo if periodo == '0' else str(int(periodo) + janela)
+        series = series_indicadores_concorrente([indicador1, indicador2], periodo_busca)
+        
+        with metricas.etapa('transformacao'):
+            tabela = alinhar_series({1: series[indicador1], 2: series[indicador2]}, 'outer')
+            if tabela.empty:
+                tabela = pd.DataFrame(columns=[1, 2], index=pd.DatetimeIndex([]), dtype='float64')
+            # Beta de indicador1 em relação a indicador2; spread = indicador1 - indicador2
+            estatisticas = estatisticas_moveis(tabela[1].to_numpy(), tabela[2].to_numpy(), janela)
+            tabela = pd.DataFrame(estatisticas, index=tabela.index)
+            tabela = tabela[tabela.index >= inicio_do_periodo(int(periodo), datetime.now())]
+        metadados = {
+            'indicador1': indicador1.upper(),
+            'indicador2': indicador2.upper(),
+            'periodo': periodo,
+            'janela': janela,
+            'atualizacao': frescor_indicadores([indicador1, indicador2], periodo)
+        }
         
-        if response.status_code == 404:
-            print("Arquivo não encontrado. Verifique se o caminho está correto.")
-            return
-            
-        print("\nTentando ler como DataFrame...")
-        df = pd.read_csv(url)
-        print("\nPrimeiras linhas:")
-        print(df.head())
+        if formato == 'binario' and cabe_no_binario(tabela, max_pontos):
+            with metricas.etapa('serializacao'):
+                corpo = codificar_series(tabela, list(tabela.columns), metadados, bytes_por_valor)
+            return corpo, MIMETYPE_BINARIO
+        
+        if max_pontos:
+            with metricas.etapa('transformacao'):
+                tabela = reduzir_pontos(tabela, max_pontos)
+        
+        with metricas.etapa('serializacao'):
+            return app.json.dumps({
+                'datas': tabela.index.strftime('%Y-%m-%d').tolist(),
+                **{coluna: valores_para_json(tabela[coluna].to_numpy()) for coluna in tabela.columns},
+                **metadados
+            }), 'application/json'
+    
+    try:
+        chave = ('correlacao', indicador1, indicador2, periodo, janela, max_pontos, bytes_por_valor)
+        return responder_com_cache(chave, [indicador1, indicador2], gerar)
+    except Exception as e:
+        logger.exception(f"Erro na rota /analise/correlacao: {str(e)}")
+        return jsonify({'erro': 'Erro ao calcular a correlação entre os indicadores'}), 500
+
+@app.before_request
+def iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+    
+    # Perfil sob demanda: só com PERFIL_TOKEN configurado e o mesmo valor no cabeçalho X-Perfil
+    token = request.headers.get('X-Perfil')
+    if PERFIL_TOKEN and token and hmac.compare_digest(token, PERFIL_TOKEN):
+        g.pilha_perfil = ExitStack()
+        g.etapas_perfil = g.pilha_perfil.enter_context(metricas.coletar())
+        g.perfil = cProfile.Profile()
+        g.perfil.enable()
+
+@app.after_request
+def encerrar_medicao(resposta):
+    duracao = time.perf_counter() - g.get('inicio_requisicao', time.perf_counter())
+    rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+    metricas.REQUISICOES.observar(duracao, rota=rota, status=resposta.status_code)
+    
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return resposta
+    perfil.disable()
+    g.pop('pilha_perfil').close()
+    return resposta_perfil(perfil, g.pop('etapas_perfil'), resposta, duracao)
+
+@app.teardown_request
+def descartar_perfil(erro=None):
+    # Se a requisição perfilada terminou em exceção, o after_request não rodou
+    perfil = g.pop('perfil', None)
+    if perfil is not None:
+        perfil.disable()
+        g.pop('pilha_perfil').close()
+
+def resposta_perfil(perfil, etapas, resposta, duracao):
+    # Troca a resposta por um resumo em texto: etapas medidas e funções mais custosas
+    saida = StringIO()
+    saida.write(f"Perfil de {request.method} {request.full_path} -> {resposta.status_code} em {duracao * 1000:.1f} ms\n\n")
+    saida.write("Etapas:\n")
+    for indicador, fonte, etapa, segundos in etapas:
+        tempo = '' if segundos is None else f"{segundos * 1000:10.2f} ms"
+        saida.write(f"  {indicador or '-':<14} {fonte or '-':<10} {etapa:<32} {tempo}\n")
+    
+    for ordem, titulo in (('cumulative', 'tempo acumulado'), ('tottime', 'tempo próprio')):
+        saida.write(f"\nFunções por {titulo}:\n")
+        pstats.Stats(perfil, stream=saida).strip_dirs().sort_stats(ordem).print_stats(25)
+    
+    relatorio = app.response_class(saida.getvalue(), mimetype='text/plain')
+    relatorio.headers['X-Perfil-Status'] = str(resposta.status_code)
+    relatorio.headers['Cache-Control'] = 'no-store'
+    return relatorio
+
+@app.route('/metrics')
+def metrics():
+    # Formato texto do Prometheus; cada processo (worker) expõe as próprias métricas
+    return app.response_class(metricas.registro.exposicao(), mimetype='text/plain; version=0.0.4')
+
+# Fontes remotas verificadas sob demanda pela rota /saude
+URLS_SAUDE = {
+    'cesta': f"{DADOS_GITHUB_URL}/cesta_basica.csv",
+    'fipezap': f"{DADOS_GITHUB_URL}/fipezap.csv",
+    'bcb': f"{BCB_API_URL}/dados/serie/bcdata.sgs.432/dados/ultimos/1?formato=json",
+}
+
+def testar_acesso(url):
+    inicio = time.monotonic()
+    try:
+        response = http_get(url, tentativas=1)
+        resultado = {'ok': response.ok, 'status_code': response.status_code}
         
+        # Para CSVs, confirma que o conteúdo baixado é legível
+        if response.ok and url.endswith('.csv'):
+            resultado['linhas'] = len(pd.read_csv(StringIO(response.text)))
     except Exception as e:
-        print(f"Erro: {str(e)}")
+        resultado = {'ok': False, 'erro': str(e)}
+    
+    resultado['url'] = url
+    resultado['tempo_ms'] = round((time.monotonic() - inicio) * 1000, 1)
+    return resultado
+
+def testar_acesso_cesta():
+    return testar_acesso(URLS_SAUDE['cesta'])
+
+def testar_acesso_fipezap():
+    return testar_acesso(URLS_SAUDE['fipezap'])
+
+@app.route('/saude')
+def saude():
+    # Testa as fontes em paralelo; nada disso roda na importação do módulo
+    resultados = dict(zip(URLS_SAUDE, executor_indicadores.map(testar_acesso, URLS_SAUDE.values())))
+    ok = all(resultado['ok'] for resultado in resultados.values())
+    return jsonify({'ok': ok, 'fontes': resultados}), 200 if ok else 503
 
-testar_acesso_cesta()
-testar_acesso_fipezap()
+# Modo antigo (opcional): testa o acesso às fontes ao subir a aplicação
+if os.environ.get('TESTAR_ACESSO_NA_INICIALIZACAO') == '1':
+    for nome, url in URLS_SAUDE.items():
+        print(f"Teste de acesso ({nome}): {testar_acesso(url)}")
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
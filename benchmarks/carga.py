@@ -0,0 +1,364 @@
+"""
+Teste de carga de ponta a ponta do /dados sem tocar nas fontes reais: sobe um servidor
+local que faz o papel do SGS/BCB, do CSV do Big Mac e do Ibovespa (com latência e taxa
+de erro configuráveis), inicia o app apontando para ele e dispara requisições
+concorrentes com uma mistura realista de indicadores e períodos.
+
+Ao final informa vazão, latências p50/p95/p99, códigos de resposta e quantas chamadas
+chegaram a cada fonte, para dimensionar workers e verificar a eficácia dos caches.
+
+As respostas das fontes vêm de arquivos gravados em --fixtures, se existirem
+(sgs_<código>.json, big-mac-full-index.csv, ibov.csv); caso contrário, são séries
+sintéticas geradas com semente fixa.
+
+Uso (na raiz do repositório):
+    python benchmarks/carga.py --requisicoes 1000 --concorrencia 16 --latencia-ms 80
+    python benchmarks/carga.py --alvo http://127.0.0.1:8000   # app já rodando
+    python benchmarks/carga.py --somente-fontes               # só os servidores falsos
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+import requests
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Códigos do SGS usados pelo app e o tipo de série de cada um
+SERIES_SGS = {
+    432: 'nivel_mensal',  # Selic meta
+    433: 'variacao',      # IPCA
+    4389: 'nivel_diario', # CDI
+    189: 'variacao',      # IGP-M
+    1: 'nivel_diario',    # Dólar
+    1619: 'nivel_mensal', # Salário mínimo
+    28140: 'nivel_mensal', # Aluguel (FipeZap)
+}
+
+# Mistura de consultas: pesos aproximados do uso da página
+PESOS_INDICADORES = {
+    'ipca': 10, 'selic': 8, 'cdi': 6, 'dolar': 8, 'igpm': 4, 'ibov': 6, 'bigmac': 2,
+    'gasolina': 3, 'energia': 2, 'cesta': 2, 'aluguel': 2, 'salario': 1, 'plano_saude': 1,
+}
+PESOS_PERIODOS = {12: 10, 24: 5, 36: 4, 60: 6, 120: 4, 240: 2, 600: 1, 0: 2}
+
+def carregar_fixtures(pasta, semente=20240101):
+    """Corpos das respostas das fontes: arquivos gravados, se houver, ou séries sintéticas"""
+    gerador = np.random.default_rng(semente)
+    hoje = pd.Timestamp(datetime.now().date())
+    fixtures = {'sgs': {}}
+
+    def gravada(nome):
+        caminho = os.path.join(pasta, nome) if pasta else None
+        if caminho and os.path.exists(caminho):
+            with open(caminho, 'rb') as arquivo:
+                return arquivo.read()
+        return None
+
+    for codigo, tipo in SERIES_SGS.items():
+        corpo = gravada(f'sgs_{codigo}.json')
+        if corpo is not None:
+            registros = json.loads(corpo)
+        else:
+            if tipo == 'nivel_diario':
+                datas = pd.bdate_range('1986-01-01', hoje)
+                valores = 10 * np.exp(np.cumsum(gerador.normal(0, 0.005, len(datas))))
+            else:
+                datas = pd.date_range('1980-01-01', hoje, freq='MS')
+                if tipo == 'variacao':
+                    valores = gerador.normal(0.5, 0.4, len(datas))
+                else:
+                    valores = 100 * np.exp(np.cumsum(gerador.normal(0.004, 0.01, len(datas))))
+            registros = [
+                {'data': data.strftime('%d/%m/%Y'), 'valor': f'{valor:.2f}'}
+                for data, valor in zip(datas, valores)
+            ]
+        # Guarda as datas já convertidas para filtrar as janelas pedidas rapidamente
+        datas = pd.to_datetime([registro['data'] for registro in registros], format='%d/%m/%Y')
+        fixtures['sgs'][codigo] = (datas.to_numpy(), registros)
+
+    fixtures['bigmac'] = gravada('big-mac-full-index.csv')
+    if fixtures['bigmac'] is None:
+        datas = pd.date_range('2000-04-01', hoje, freq='6MS')
+        linhas = ['date,iso_a3,currency_code,name,local_price,dollar_ex,GDP_dollar']
+        for pais, preco in (('BRA', 2.95), ('USA', 2.24), ('ARG', 2.5), ('MEX', 20.9)):
+            precos = preco * np.exp(np.cumsum(gerador.normal(0.03, 0.02, len(datas))))
+            linhas += [f'{data:%Y-%m-%d},{pais},XXX,{pais},{valor:.2f},1.0,10000' for data, valor in zip(datas, precos)]
+        fixtures['bigmac'] = ('\n'.join(linhas) + '\n').encode('utf-8')
+
+    fixtures['ibov'] = gravada('ibov.csv')
+    if fixtures['ibov'] is None:
+        datas = pd.bdate_range('1993-04-27', hoje)
+        fechamento = 1000 * np.exp(np.cumsum(gerador.normal(0.0004, 0.015, len(datas))))
+        fixtures['ibov'] = pd.DataFrame({'Date': datas.strftime('%Y-%m-%d'), 'Close': fechamento.round(2)}) \
+            .to_csv(index=False).encode('utf-8')
+    fixtures['ibov_df'] = pd.read_csv(io.BytesIO(fixtures['ibov']), parse_dates=['Date'])
+    return fixtures
+
+class FontesFalsas:
+    """Servidor HTTP local que imita as fontes externas e conta as chamadas recebidas"""
+
+    def __init__(self, fixtures, latencia_ms=50, jitter_ms=20, taxa_erro=0.0, porta=0):
+        self.fixtures = fixtures
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.chamadas = Counter()
+        self._lock = threading.Lock()
+        self._aleatorio = random.Random(7)
+
+        fontes = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fontes.atender(self)
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', porta), Manipulador)
+        self.servidor.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.servidor.server_port}'
+
+    def iniciar(self):
+        threading.Thread(target=self.servidor.serve_forever, name='fontes-falsas', daemon=True).start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+
+    def variaveis_ambiente(self):
+        """Variáveis que fazem o app usar estas fontes no lugar das reais"""
+        return {
+            'BCB_API_URL': self.url,
+            'GITHUB_RAW_URL': self.url,
+            'BIGMAC_URL': f'{self.url}/bigmac/big-mac-full-index.csv',
+            'IBOV_CSV_URL': f'{self.url}/ibov.csv',
+        }
+
+    def _contar(self, fonte, status):
+        with self._lock:
+            self.chamadas[(fonte, status)] += 1
+
+    def _responder(self, manipulador, fonte, status, corpo=b'', tipo='application/json', cabecalhos=None):
+        self._contar(fonte, status)
+        manipulador.send_response(status)
+        manipulador.send_header('Content-Type', tipo)
+        manipulador.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            manipulador.send_header(nome, valor)
+        manipulador.end_headers()
+        manipulador.wfile.write(corpo)
+
+    def atender(self, manipulador):
+        url = urlparse(manipulador.path)
+        params = {nome: valores[0] for nome, valores in parse_qs(url.query).items()}
+        sgs = re.match(r'/dados/serie/bcdata\.sgs\.(\d+)/dados', url.path)
+        if sgs:
+            fonte = 'bcb'
+        elif url.path.startswith('/bigmac'):
+            fonte = 'bigmac'
+        elif url.path.startswith('/ibov'):
+            fonte = 'ibov'
+        else:
+            fonte = 'github'
+
+        with self._lock:
+            espera = max(0.0, self.latencia_ms + self._aleatorio.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            falhar = self._aleatorio.random() < self.taxa_erro
+        time.sleep(espera)
+        if falhar:
+            return self._responder(manipulador, fonte, 503, b'{"erro": "indisponivel"}')
+
+        if fonte == 'bcb':
+            return self._responder_sgs(manipulador, int(sgs.group(1)), params)
+        if fonte == 'bigmac':
+            return self._responder_estatico(manipulador, fonte, self.fixtures['bigmac'])
+        if fonte == 'ibov':
+            df = self.fixtures['ibov_df']
+            mascara = np.ones(len(df), dtype=bool)
+            if 'inicio' in params:
+                mascara &= (df['Date'] >= params['inicio']).to_numpy()
+            if 'fim' in params:
+                mascara &= (df['Date'] < params['fim']).to_numpy()
+            corpo = df[mascara].to_csv(index=False, date_format='%Y-%m-%d').encode('utf-8')
+            return self._responder(manipulador, fonte, 200, corpo, 'text/csv')
+        return self._responder(manipulador, fonte, 404, b'')
+
+    def _responder_sgs(self, manipulador, codigo, params):
+        if codigo not in self.fixtures['sgs']:
+            return self._responder(manipulador, 'bcb', 404, b'[]')
+        datas, registros = self.fixtures['sgs'][codigo]
+        inicio = np.datetime64(datetime.strptime(params.get('dataInicial', '01/01/1900'), '%d/%m/%Y'))
+        fim = np.datetime64(datetime.strptime(params.get('dataFinal', '31/12/2999'), '%d/%m/%Y'))
+        posicoes = np.flatnonzero((datas >= inicio) & (datas <= fim))
+        if not len(posicoes):
+            # Como o SGS: janela sem nenhum valor responde 404
+            return self._responder(manipulador, 'bcb', 404, b'[]')
+        corpo = json.dumps([registros[i] for i in posicoes]).encode('utf-8')
+        return self._responder(manipulador, 'bcb', 200, corpo)
+
+    def _responder_estatico(self, manipulador, fonte, corpo):
+        # Arquivo fixo com ETag, como o raw.githubusercontent.com: revalidações respondem 304
+        etag = '"' + hashlib.sha1(corpo).hexdigest() + '"'
+        if manipulador.headers.get('If-None-Match') == etag:
+            return self._responder(manipulador, fonte, 304, b'', cabecalhos={'ETag': etag})
+        return self._responder(manipulador, fonte, 200, corpo, 'text/csv', {'ETag': etag})
+
+def iniciar_app(porta, ambiente, pasta):
+    """Sobe o app num processo separado, com caches próprios numa pasta temporária"""
+    variaveis = dict(os.environ)
+    variaveis.update(ambiente)
+    variaveis.update({
+        'SERIES_DB': os.path.join(pasta, 'series.sqlite'),
+        'HTTP_CACHE_DIR': os.path.join(pasta, 'http'),
+        'PASTA_MATERIALIZADO': os.path.join(pasta, 'materializado'),
+    })
+    log = open(os.path.join(pasta, 'app.log'), 'wb')
+    processo = subprocess.Popen(
+        [sys.executable, '-c',
+         f"import app; app.app.run(host='127.0.0.1', port={porta}, threaded=True, use_reloader=False)"],
+        cwd=RAIZ, env=variaveis, stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f'http://127.0.0.1:{porta}'
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O app terminou ao iniciar; veja {log.name}")
+        try:
+            requests.get(url + '/', timeout=1)
+            return processo, url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("O app não respondeu em 60s")
+
+def gerar_consultas(quantidade, semente=42):
+    """Pares de indicadores e períodos sorteados segundo os pesos de uso"""
+    aleatorio = random.Random(semente)
+    indicadores, pesos = zip(*PESOS_INDICADORES.items())
+    periodos, pesos_periodos = zip(*PESOS_PERIODOS.items())
+    consultas = []
+    for _ in range(quantidade):
+        indicador1, indicador2 = aleatorio.choices(indicadores, pesos, k=2)
+        periodo = aleatorio.choices(periodos, pesos_periodos)[0]
+        consultas.append({'indicador1': indicador1, 'indicador2': indicador2, 'periodo': periodo})
+    return consultas
+
+def disparar(url, consultas, concorrencia, timeout=60):
+    """Executa as consultas com `concorrencia` clientes simultâneos; retorna (resultados, segundos)"""
+    local = threading.local()
+
+    def requisitar(params):
+        sessao = getattr(local, 'sessao', None)
+        if sessao is None:
+            sessao = local.sessao = requests.Session()
+        inicio = time.perf_counter()
+        try:
+            status = sessao.get(f'{url}/dados', params=params, timeout=timeout).status_code
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        return status, time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        resultados = list(executor.map(requisitar, consultas))
+    return resultados, time.perf_counter() - inicio
+
+def relatorio(resultados, duracao, chamadas, concorrencia):
+    latencias = np.array([latencia for _, latencia in resultados]) * 1000
+    status = Counter(str(codigo) for codigo, _ in resultados)
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+
+    print(f"\nRequisições: {len(resultados)} com {concorrencia} clientes em {duracao:.2f}s")
+    print(f"Vazão: {len(resultados) / duracao:.1f} req/s")
+    print(f"Latência: p50 {p50:.1f} ms   p95 {p95:.1f} ms   p99 {p99:.1f} ms   máx {latencias.max():.1f} ms")
+    print("Respostas: " + ', '.join(f"{codigo}: {total}" for codigo, total in sorted(status.items())))
+
+    print("Chamadas às fontes:")
+    if not chamadas:
+        print("  nenhuma")
+    por_fonte = Counter()
+    for (fonte, codigo), total in sorted(chamadas.items()):
+        por_fonte[fonte] += total
+        print(f"  {fonte:<8} {codigo}: {total}")
+    total_fontes = sum(por_fonte.values())
+    print(f"  total    {total_fontes} ({total_fontes / len(resultados):.3f} por requisição)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requisicoes', type=int, default=500)
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--aquecimento', type=int, default=0,
+                        help='requisições iniciais (cache frio) disparadas antes da medição')
+    parser.add_argument('--latencia-ms', type=float, default=50, help='latência média das fontes falsas')
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help='fração de respostas 503 das fontes')
+    parser.add_argument('--fixtures', default=os.path.join(RAIZ, 'benchmarks', 'fixtures'),
+                        help='pasta com respostas gravadas das fontes')
+    parser.add_argument('--porta-fontes', type=int, default=0)
+    parser.add_argument('--porta-app', type=int, default=5055)
+    parser.add_argument('--alvo', help='URL de um app já rodando (configurado com as variáveis das fontes)')
+    parser.add_argument('--somente-fontes', action='store_true',
+                        help='sobe só as fontes falsas e mostra as variáveis de ambiente')
+    args = parser.parse_args()
+
+    fontes = FontesFalsas(
+        carregar_fixtures(args.fixtures), args.latencia_ms, args.jitter_ms, args.taxa_erro, args.porta_fontes
+    ).iniciar()
+
+    if args.somente_fontes:
+        print(f"Fontes falsas em {fontes.url}. Suba o app com:")
+        for nome, valor in fontes.variaveis_ambiente().items():
+            print(f"  export {nome}={valor}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        processo = None
+        try:
+            if args.alvo:
+                url = args.alvo.rstrip('/')
+            else:
+                processo, url = iniciar_app(args.porta_app, fontes.variaveis_ambiente(), pasta)
+            print(f"App em {url}, fontes falsas em {fontes.url} "
+                  f"(latência {args.latencia_ms:.0f}±{args.jitter_ms:.0f} ms, erro {args.taxa_erro:.0%})")
+
+            consultas = gerar_consultas(args.aquecimento + args.requisicoes)
+            if args.aquecimento:
+                resultados, duracao = disparar(url, consultas[:args.aquecimento], args.concorrencia)
+                print(f"Aquecimento: {len(resultados)} requisições em {duracao:.2f}s, "
+                      f"{sum(fontes.chamadas.values())} chamadas às fontes")
+            antes = Counter(fontes.chamadas)
+
+            resultados, duracao = disparar(url, consultas[args.aquecimento:], args.concorrencia)
+            relatorio(resultados, duracao, fontes.chamadas - antes, args.concorrencia)
+        finally:
+            if processo is not None:
+                processo.terminate()
+                processo.wait(timeout=10)
+            fontes.parar()
+
+if __name__ == '__main__':
+    main()
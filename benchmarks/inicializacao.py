@@ -0,0 +1,52 @@
+"""
+Mede o tempo de inicialização a frio da aplicação: cada repetição sobe um
+interpretador novo e importa o módulo app, como faz um worker do gunicorn.
+
+Uso (na raiz do repositório):
+    python benchmarks/inicializacao.py --repeticoes 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# O processo filho mede só o import; o pai mede o processo inteiro
+CODIGO_FILHO = (
+    "import time; inicio = time.perf_counter(); import app; "
+    "print(time.perf_counter() - inicio)"
+)
+
+def medir(repeticoes):
+    tempos_import = []
+    tempos_processo = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run(
+            [sys.executable, '-c', CODIGO_FILHO],
+            cwd=RAIZ, capture_output=True, text=True, check=True
+        )
+        tempos_processo.append(time.perf_counter() - inicio)
+        tempos_import.append(float(saida.stdout.strip().splitlines()[-1]))
+    return tempos_import, tempos_processo
+
+def resumir(nome, tempos):
+    print(f"{nome:<10} min {min(tempos) * 1000:8.1f} ms   "
+          f"mediana {statistics.median(tempos) * 1000:8.1f} ms   "
+          f"max {max(tempos) * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    tempos_import, tempos_processo = medir(args.repeticoes)
+    print(f"Inicialização a frio ({args.repeticoes} repetições, Python {sys.version.split()[0]})")
+    resumir('import app', tempos_import)
+    resumir('processo', tempos_processo)
+
+if __name__ == '__main__':
+    main()
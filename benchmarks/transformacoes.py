@@ -0,0 +1,316 @@
+"""
+Micro-benchmark do pipeline de transformação das séries, sem acesso à rede: mede as
+funções do próprio app.py, etapa por etapa (carregamento da série do indicador,
+reamostragem mensal, recorte do período, alinhamento, redução de pontos, serialização
+JSON/binária e a resposta completa de /dados), para cada tipo de indicador e para
+todos os períodos oferecidos na página.
+
+O app é importado apontando para um histórico SQLite e uma pasta de materializados
+temporários, preenchidos com fixtures fixas: séries sintéticas no formato do SGS/BCB
+(diária e mensal) e do yfinance, geradas com semente constante, e os CSVs de data/.
+
+Uso (na raiz do repositório):
+    python benchmarks/transformacoes.py                  # compara com a base gravada
+    python benchmarks/transformacoes.py --detalhar       # mostra todas as etapas
+    python benchmarks/transformacoes.py --salvar-base    # grava a base atual
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+CAMINHO_BASE = os.path.join(RAIZ, 'benchmarks', 'base_transformacoes.json')
+
+# Períodos do seletor de index.html, em meses (0 = todo o histórico)
+PERIODOS = [12, 24, 36, 60, 120, 240, 600, 0]
+
+# Data fixa de "hoje": as fixtures terminam nela e o datetime.now() do app é trocado
+# por ela, para que os tamanhos e recortes não mudem de uma execução para outra
+HOJE = datetime(2026, 1, 15)
+
+# Pontos por resposta usados na etapa de redução (largura típica do gráfico)
+MAX_PONTOS = 1000
+
+# Diferença mínima (em ms) para uma etapa mais lenta contar como regressão; abaixo
+# disso a variação entre execuções da mesma árvore já passa de 50%
+LIMIAR_ABSOLUTO_MS = 2.0
+
+# Etapa que repete as demais de ponta a ponta; fica fora do total
+ETAPA_RESPOSTA = 'resposta'
+
+def importar_app(pasta):
+    """Importa app.py isolado da rede e dos dados locais, com histórico e materializados em pasta"""
+    os.environ.update({
+        'SERIES_DB': os.path.join(pasta, 'series.sqlite'),
+        'PASTA_MATERIALIZADO': os.path.join(pasta, 'materializado'),
+        'SERVIR_ULTIMA_COPIA': '0',
+        'VALIDADE_COPIA_SERIES': str(10 ** 9),
+        'BCB_API_URL': 'http://127.0.0.1:9',
+        'IBOV_CSV_URL': '',
+    })
+    import app
+    app.datetime = DataFixa
+    return app
+
+class DataFixa(datetime):
+    """datetime cujo now() é sempre HOJE, para os recortes do app não dependerem do calendário"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(HOJE.year, HOJE.month, HOJE.day)
+
+def registros_sgs(datas, valores):
+    """Registros no formato devolvido pela API do SGS"""
+    return [
+        {'data': data.strftime('%d/%m/%Y'), 'valor': f'{valor:.4f}'.replace('.', ',')}
+        for data, valor in zip(datas, valores)
+    ]
+
+def gerar_fixtures():
+    gerador = np.random.default_rng(20240101)
+
+    # Série diária (dólar/CDI): dias úteis desde 1986, passeio aleatório multiplicativo
+    dias = pd.bdate_range('1986-01-01', HOJE)
+    diaria = np.exp(np.cumsum(gerador.normal(0, 0.01, len(dias))))
+
+    # Série mensal de variação % (IPCA/IGP-M) desde 1979, para o acumulado do período 0
+    meses = pd.date_range('1979-01-01', HOJE, freq='MS')
+    mensal = gerador.normal(0.5, 0.4, len(meses))
+
+    # Ibovespa como o yfinance devolve: colunas em MultiIndex (campo, ticker)
+    pregoes = pd.bdate_range('1993-04-27', HOJE)
+    fechamento = 1000 * np.exp(np.cumsum(gerador.normal(0, 0.015, len(pregoes))))
+    ibov = pd.DataFrame(
+        {('Close', '^BVSP'): fechamento, ('Volume', '^BVSP'): gerador.integers(1, 10**6, len(pregoes))},
+        index=pregoes
+    )
+
+    return {
+        'bcb_diaria': registros_sgs(dias, diaria),
+        'bcb_mensal': registros_sgs(meses, mensal),
+        'yfinance': ibov,
+    }
+
+def cronometrar(funcao, repeticoes):
+    """Executa funcao repetidas vezes; retorna (mediana, mínimo) em ms e o último resultado"""
+    tempos = []
+    gc.collect()
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), min(tempos), resultado
+
+def etapas_indicador(app, indicador, carregar):
+    """
+    Etapas de um indicador, nas funções do app: carregar(periodo) faz a parte específica
+    da fonte e grava estado['serie']; o resto é o caminho comum de /dados.
+    """
+    cliente = app.app.test_client()
+
+    def etapas(periodo):
+        periodo_str = str(periodo)
+        # Cada etapa lê a saída da anterior e grava com outro nome, para poder ser repetida
+        estado = {}
+
+        def mensal():
+            estado['mensal'] = app.para_mensal(estado['serie'])
+
+        def recortar():
+            # Nas requisições, o recorte é feito sobre a série materializada (todo o histórico)
+            estado['recortada'] = app.recortar_periodo(app.materializados.ler(indicador), periodo_str)
+
+        def alinhar():
+            serie = estado['recortada']
+            estado['tabela'] = app.alinhar_series({1: serie, 2: serie.shift(1)})
+
+        def reduzir():
+            estado['reduzida'] = app.reduzir_pontos(estado['tabela'], MAX_PONTOS)
+
+        def responder():
+            # Resposta completa de /dados, sem o cache de respostas
+            with app.lock_cache_respostas:
+                app.cache_respostas.clear()
+            resposta = cliente.get(f'/dados?indicador1={indicador}&indicador2={indicador}&periodo={periodo_str}')
+            assert resposta.status_code == 200, resposta.status_code
+
+        yield from carregar(periodo_str, estado)
+        yield 'mensal', mensal
+        yield 'recorte', recortar
+        yield 'alinhamento', alinhar
+        yield 'reducao', reduzir
+        yield 'json', lambda: app.json_dados(estado['reduzida'], {'indicador1': indicador, 'indicador2': indicador})
+        yield 'binario', lambda: app.codificar_series(estado['tabela'], [indicador, indicador])
+        # processar_dados_indicador = serie_indicador (acima) + serie_para_listas
+        yield 'listas', lambda: app.serie_para_listas(estado['serie'])
+        yield ETAPA_RESPOSTA, responder
+    return etapas
+
+def carregar_serie_indicador(app, indicador):
+    """Fontes locais (histórico do BCB e CSVs): serie_indicador completo"""
+    def carregar(periodo_str, estado):
+        def carregar_serie():
+            estado['serie'] = app.serie_indicador(indicador, periodo_str)
+        yield 'serie_indicador', carregar_serie
+    return carregar
+
+def carregar_csv(app, indicador):
+    """CSV: leitura do arquivo (o app só refaz quando o mtime muda) e serie_indicador"""
+    arquivo = app.arquivos_csv[indicador]
+
+    def carregar(periodo_str, estado):
+        # Um registro novo a cada execução força a leitura do arquivo
+        yield 'parse', lambda: app.RegistroCSV(app.registro_csv.pasta).serie(arquivo)
+        yield from carregar_serie_indicador(app, indicador)(periodo_str, estado)
+    return carregar
+
+def carregar_yfinance(app, ibov):
+    """Ibovespa: a parte de obter_dados_ibovespa posterior ao download"""
+    def carregar(periodo_str, estado):
+        inicio = app.inicio_do_periodo(int(periodo_str), HOJE)
+
+        def extrair():
+            estado['serie'] = app.serie_fechamento(ibov.loc[inicio:])
+        yield 'serie_indicador', extrair
+    return carregar
+
+def preparar_casos(app):
+    fixtures = gerar_fixtures()
+
+    ingestao = {}
+    for indicador, nome in (('dolar', 'bcb_diaria'), ('ipca', 'bcb_mensal')):
+        inicio = time.perf_counter()
+        # Cobertura desde antes do início do histórico, para nenhuma consulta ir ao BCB
+        app.series_store.salvar(app.codigos_bcb[indicador], fixtures[nome], datetime(1970, 1, 1), HOJE)
+        ingestao[nome] = (time.perf_counter() - inicio) * 1000
+
+    # O recorte e a rota leem a série materializada, como em produção
+    for indicador in ('dolar', 'ipca', 'energia', 'gasolina'):
+        app.materializar_indicador(indicador)
+    app.materializados.salvar('ibov', app.para_mensal(app.serie_fechamento(fixtures['yfinance'])))
+
+    casos = {
+        'bcb_diaria': etapas_indicador(app, 'dolar', carregar_serie_indicador(app, 'dolar')),
+        'bcb_mensal_acumulado': etapas_indicador(app, 'ipca', carregar_serie_indicador(app, 'ipca')),
+        'yfinance': etapas_indicador(app, 'ibov', carregar_yfinance(app, fixtures['yfinance'])),
+        'csv_energia': etapas_indicador(app, 'energia', carregar_csv(app, 'energia')),
+        'csv_gasolina': etapas_indicador(app, 'gasolina', carregar_csv(app, 'gasolina')),
+    }
+    return casos, ingestao
+
+def medir(repeticoes, rodadas=1):
+    """
+    Mede todas as etapas. Com várias rodadas, o conjunto inteiro é repetido (intercalando
+    os casos) e cada etapa fica com o menor tempo e a mediana das medianas das rodadas,
+    o que atenua variações da máquina ao longo da execução.
+    """
+    with tempfile.TemporaryDirectory() as pasta:
+        app = importar_app(pasta)
+        casos, ingestao = preparar_casos(app)
+        amostras = {}
+        for _ in range(rodadas):
+            for nome, etapas in casos.items():
+                for periodo in PERIODOS:
+                    caso = amostras.setdefault(f'{nome}/{periodo}', {})
+                    for etapa, funcao in etapas(periodo):
+                        mediana, minimo, _ = cronometrar(funcao, repeticoes)
+                        caso.setdefault(etapa, []).append((mediana, minimo))
+
+    resultados = {}
+    for caso, etapas in amostras.items():
+        medidas = {
+            etapa: {
+                'mediana_ms': round(statistics.median(m for m, _ in medicoes), 4),
+                'min_ms': round(min(minimo for _, minimo in medicoes), 4),
+            }
+            for etapa, medicoes in etapas.items()
+        }
+        parciais = [m for etapa, m in medidas.items() if etapa != ETAPA_RESPOSTA]
+        medidas['total'] = {
+            'mediana_ms': round(sum(m['mediana_ms'] for m in parciais), 4),
+            'min_ms': round(sum(m['min_ms'] for m in parciais), 4),
+        }
+        resultados[caso] = medidas
+    return resultados, ingestao
+
+def ambiente():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def comparar(resultados, base, tolerancia, detalhar=False):
+    """
+    Imprime a tabela (só os totais e as regressões, a menos que detalhar seja True) e
+    retorna as etapas que ficaram mais lentas que a base além da tolerância. A
+    comparação usa o menor tempo de cada etapa, bem menos sujeito a ruído que a mediana.
+    """
+    regressoes = []
+    print(f"{'caso/período':<28} {'etapa':<12} {'mediana':>10} {'mínimo':>10} {'base':>10} {'variação':>9}")
+    for caso, medidas in resultados.items():
+        for etapa, medida in medidas.items():
+            atual = medida['min_ms']
+            anterior = base.get(caso, {}).get(etapa, {}).get('min_ms')
+            colunas = f"{caso:<28} {etapa:<12} {medida['mediana_ms']:8.3f}ms {atual:8.3f}ms"
+            if anterior:
+                variacao = atual / anterior - 1
+                marca = ''
+                # Etapas muito curtas oscilam demais para serem comparadas em termos relativos
+                if variacao > tolerancia and atual - anterior > LIMIAR_ABSOLUTO_MS:
+                    marca = '  REGRESSÃO'
+                    regressoes.append((caso, etapa, anterior, atual))
+                if detalhar or marca or etapa == 'total':
+                    print(f"{colunas} {anterior:8.3f}ms {variacao:+8.0%}{marca}")
+            elif detalhar or etapa == 'total':
+                print(f"{colunas} {'-':>10} {'':>9}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=20, help='execuções de cada etapa por rodada')
+    parser.add_argument('--rodadas', type=int, default=5, help='vezes que o conjunto inteiro é medido')
+    parser.add_argument('--salvar-base', action='store_true', help='grava os resultados como nova base')
+    parser.add_argument('--detalhar', action='store_true', help='mostra todas as etapas, não só os totais')
+    parser.add_argument('--base', default=CAMINHO_BASE)
+    parser.add_argument('--tolerancia', type=float, default=1.0,
+                        help='aumento relativo do menor tempo considerado regressão (padrão 100%%)')
+    args = parser.parse_args()
+
+    resultados, ingestao = medir(args.repeticoes, args.rodadas)
+    print("Ingestão no histórico local: " + ', '.join(f"{nome} {ms:.1f} ms" for nome, ms in ingestao.items()))
+
+    base = {}
+    if os.path.exists(args.base):
+        with open(args.base, encoding='utf-8') as arquivo:
+            base = json.load(arquivo).get('resultados', {})
+
+    regressoes = comparar(resultados, base, args.tolerancia, args.detalhar)
+
+    if args.salvar_base:
+        with open(args.base, 'w', encoding='utf-8') as arquivo:
+            json.dump({'ambiente': ambiente(), 'repeticoes': args.repeticoes, 'rodadas': args.rodadas,
+                       'resultados': resultados},
+                      arquivo, indent=1, ensure_ascii=False)
+            arquivo.write('\n')
+        print(f"Base gravada em {args.base}")
+    elif regressoes:
+        print(f"\n{len(regressoes)} etapa(s) mais lentas que a base além de {args.tolerancia:.0%}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
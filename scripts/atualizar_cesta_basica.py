@@ -1,9 +1,15 @@
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 import logging
 import re
+import os
+import sys
+
+# Permite importar utils/ ao rodar como python scripts/<arquivo>.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.http_client import http_get
+from utils.arquivos import acrescentar_linhas_csv
 
 def atualizar_cesta_basica():
     """Atualiza dados da cesta básica de São Paulo"""
@@ -12,8 +18,9 @@ def atualizar_cesta_basica():
         url = "https://www.dieese.org.br/analisecestabasica"
         
         print(f"Acessando página principal: {url}")
-        response = requests.get(url)
+        response = http_get(url)
         print(f"Status code: {response.status_code}")
+        response.raise_for_status()
         
         if response.status_code == 200:
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -31,7 +38,8 @@ def atualizar_cesta_basica():
                 url_pesquisa = f"https://www.dieese.org.br{ultimo_link}"
                 print(f"Acessando última pesquisa: {url_pesquisa}")
                 
-                response_pesquisa = requests.get(url_pesquisa)
+                response_pesquisa = http_get(url_pesquisa)
+                response_pesquisa.raise_for_status()
                 if response_pesquisa.status_code == 200:
                     soup_pesquisa = BeautifulSoup(response_pesquisa.content, 'html.parser')
                     
@@ -59,31 +67,32 @@ def atualizar_cesta_basica():
                                     mes = data_str[4:]
                                     data = f"{ano}-{mes}-30"
                                     
-                                    # Atualiza CSV
+                                    # Acrescenta a linha ao CSV só se o mês ainda não estiver gravado
                                     try:
-                                        df = pd.read_csv('data/cesta_basica.csv')
-                                    except:
-                                        df = pd.DataFrame(columns=['data', 'valor'])
+                                        datas = pd.read_csv('data/cesta_basica.csv', usecols=['data'])['data']
+                                    except FileNotFoundError:
+                                        datas = pd.Series([], dtype=str)
                                     
-                                    nova_linha = pd.DataFrame([{'data': data, 'valor': valor}])
-                                    df = pd.concat([df, nova_linha], ignore_index=True)
-                                    df = df.drop_duplicates(subset=['data'])
-                                    df = df.sort_values('data')
+                                    if data in set(datas.astype(str)):
+                                        print(f"Mês {data} já registrado")
+                                        return 0
                                     
-                                    df.to_csv('data/cesta_basica.csv', index=False)
+                                    nova_linha = pd.DataFrame([{'data': data, 'valor': valor}])
+                                    adicionados = acrescentar_linhas_csv('data/cesta_basica.csv', nova_linha)
                                     print(f"Dados atualizados: {data} - R$ {valor:.2f}")
-                                    return
+                                    return adicionados
                         
-                        print("Linha de São Paulo não encontrada na tabela")
+                        raise RuntimeError("Linha de São Paulo não encontrada na tabela")
                     else:
-                        print("Tabela principal não encontrada")
+                        raise RuntimeError("Tabela principal não encontrada")
             else:
-                print("Nenhum link de pesquisa encontrado")
+                raise RuntimeError("Nenhum link de pesquisa encontrado")
                 
     except Exception as e:
         print(f"Erro ao atualizar dados da cesta básica: {e}")
         import traceback
         print(traceback.format_exc())
+        raise
 
 if __name__ == "__main__":
     atualizar_cesta_basica() 
\ No newline at end of file
@@ -1,13 +1,19 @@
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
+import threading
 import time
 import json
 import os
+import sys
 from atualizar_plano_saude import atualizar_plano_saude
 from atualizar_cesta_basica import atualizar_cesta_basica
 
+# Permite importar utils/ ao rodar como python scripts/<arquivo>.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.http_client import http_get
+from utils.arquivos import escrever_atomico, acrescentar_linhas_csv
+
 def verificar_arquivos():
     """Verifica se os arquivos CSV necessários existem"""
     arquivos = ['energia.csv', 'cesta_basica.csv', 'gasolina.csv', 'fipezap.csv']
@@ -15,7 +21,7 @@ def verificar_arquivos():
         caminho = f'data/{arquivo}'
         if not os.path.exists(caminho):
             print(f"Arquivo {arquivo} não encontrado. Criando arquivo vazio...")
-            pd.DataFrame(columns=['data', 'valor']).to_csv(caminho, index=False)
+            escrever_atomico(caminho, 'data,valor\n')
 
 def ajustar_data_ultimo_dia(df):
     """Ajusta as datas para o último dia do mês"""
@@ -41,29 +47,30 @@ def atualizar_gasolina():
         }
         
         # Faz a requisição
-        response = requests.get(url, headers=headers)
+        response = http_get(url, headers=headers)
         response.raise_for_status()
         
         # Processa os dados mais recentes
         novos_dados = []
         # ... código para processar os dados ...
         
-        # Atualiza o arquivo CSV se houver dados novos
+        # Acrescenta ao CSV só os meses posteriores ao último já gravado
+        adicionados = 0
         if novos_dados:
-            df_novo = pd.DataFrame(novos_dados)
-            df_novo = ajustar_data_ultimo_dia(df_novo)
-            df_final = pd.concat([df_atual, df_novo])
-            df_final = df_final.sort_values('data')
-            df_final = df_final.drop_duplicates(subset=['data'])
-            df_final.to_csv('data/gasolina.csv', index=False)
-            print(f"Dados da gasolina atualizados: {len(novos_dados)} novos registros")
+            df_novo = ajustar_data_ultimo_dia(pd.DataFrame(novos_dados))
+            df_novo = df_novo[df_novo['data'] > ultima_data].drop_duplicates(subset=['data']).sort_values('data')
+            adicionados = acrescentar_linhas_csv('data/gasolina.csv', df_novo)
+        
+        if adicionados:
+            print(f"Dados da gasolina atualizados: {adicionados} novos registros")
         else:
             print("Nenhum dado novo da gasolina encontrado")
-            df_final = df_atual  # Mantém os dados atuais se não houver novos
+        return adicionados
         
     except Exception as e:
+        # Em caso de erro, o arquivo atual fica como está e a falha vai para o relatório
         print(f"Erro ao atualizar dados da gasolina: {e}")
-        df_final = df_atual  # Em caso de erro, mantém os dados atuais
+        raise
 
 def atualizar_fipezap():
     """
@@ -86,24 +93,86 @@ def atualizar_fipezap():
         }
         
         # Faz request
-        response = requests.get(url, headers=headers)
+        response = http_get(url, headers=headers)
+        response.raise_for_status()
         data = response.json()
         
         # Processa dados novos
         novos_dados = []
         # ... código de processamento específico do FipeZap ...
         
-        # Atualiza CSV se tiver dados novos
+        # Acrescenta ao CSV só os registros posteriores ao último já gravado
+        adicionados = 0
         if novos_dados:
             df_novo = pd.DataFrame(novos_dados)
-            df_final = pd.concat([df_atual, df_novo]).drop_duplicates()
-            df_final.to_csv('data/fipezap.csv', index=False)
-            print(f"Dados do FipeZap atualizados: {len(novos_dados)} novos registros")
+            df_novo['data'] = pd.to_datetime(df_novo['data'])
+            df_novo = df_novo[df_novo['data'] > ultima_data].drop_duplicates(subset=['data']).sort_values('data')
+            adicionados = acrescentar_linhas_csv('data/fipezap.csv', df_novo)
+        
+        if adicionados:
+            print(f"Dados do FipeZap atualizados: {adicionados} novos registros")
         else:
             print("Nenhum dado novo do FipeZap encontrado")
+        return adicionados
             
     except Exception as e:
         print(f"Erro ao atualizar FipeZap: {e}")
+        raise
+
+# Colunas do arquivo de tarifas da ANEEL que interessam ao indicador de energia
+COLUNA_DATA_ANEEL = 'Data Início Vigência'
+COLUNA_TARIFA_ANEEL = 'Tarifa Convencional B1'
+
+# Linhas lidas por vez do arquivo da ANEEL e registros por página da API CKAN
+LINHAS_POR_BLOCO = 50000
+REGISTROS_POR_PAGINA_CKAN = 1000
+
+def ler_tarifas_aneel(url, headers, ultima_data):
+    """
+    Lê o CSV da ANEEL em blocos direto da resposta, à medida que chega, só com as
+    colunas de data e tarifa, e guarda apenas as linhas posteriores a ultima_data.
+    A memória usada não cresce com o tamanho do arquivo.
+    """
+    with http_get(url, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        # Descomprime gzip/deflate da transferência ao ler o corpo bruto
+        response.raw.decode_content = True
+        
+        blocos = pd.read_csv(
+            response.raw,
+            sep=';',
+            decimal=',',
+            usecols=[COLUNA_DATA_ANEEL, COLUNA_TARIFA_ANEEL],
+            dtype={COLUNA_DATA_ANEEL: str},
+            chunksize=LINHAS_POR_BLOCO
+        )
+        novos = []
+        for bloco in blocos:
+            datas = pd.to_datetime(bloco[COLUNA_DATA_ANEEL], format='%d/%m/%Y', errors='coerce')
+            recentes = datas > ultima_data
+            if recentes.any():
+                novos.append(pd.DataFrame({
+                    'data': datas[recentes],
+                    'valor': pd.to_numeric(bloco.loc[recentes, COLUNA_TARIFA_ANEEL], errors='coerce')
+                }))
+    
+    if not novos:
+        return pd.DataFrame(columns=['data', 'valor'])
+    return pd.concat(novos, ignore_index=True)
+
+def paginar_ckan(api_url, params, tamanho_pagina=REGISTROS_POR_PAGINA_CKAN):
+    """Percorre os registros do datastore_search do CKAN página a página (limit/offset)"""
+    offset = 0
+    while True:
+        response = http_get(api_url, params={**params, 'limit': tamanho_pagina, 'offset': offset})
+        response.raise_for_status()
+        resultado = response.json()['result']
+        registros = resultado['records']
+        yield from registros
+        
+        offset += len(registros)
+        if len(registros) < tamanho_pagina or offset >= resultado.get('total', offset + 1):
+            return
 
 def atualizar_dados_energia():
     """Atualiza dados de energia da ANEEL"""
@@ -122,93 +191,132 @@ def atualizar_dados_energia():
         }
         
         try:
-            # Tenta baixar diretamente o arquivo mais recente
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            # Salva temporariamente o arquivo
-            with open('temp_energia.csv', 'wb') as f:
-                f.write(response.content)
-            
-            # Lê o arquivo CSV
-            df_novo = pd.read_csv('temp_energia.csv', sep=';', decimal=',')
-            
-            # Remove o arquivo temporário
-            os.remove('temp_energia.csv')
-            
-            # Processa as colunas
-            df_novo['data'] = pd.to_datetime(df_novo['Data Início Vigência'], format='%d/%m/%Y')
-            df_novo['valor'] = pd.to_numeric(df_novo['Tarifa Convencional B1'], errors='coerce')
-            
-            # Filtra apenas registros mais recentes
-            df_novo = df_novo[df_novo['data'] > ultima_data]
+            # Lê o arquivo mais recente em streaming, já filtrando os registros novos
+            df_novo = ler_tarifas_aneel(url, headers, ultima_data)
             
             if not df_novo.empty:
-                # Prepara os novos registros
-                novos_registros = df_novo[['data', 'valor']].copy()
-                
-                # Concatena com dados existentes
-                df_completo = pd.concat([df_atual, novos_registros])
-                
-                # Ordena e remove duplicatas
-                df_completo = df_completo.sort_values('data')
-                df_completo = df_completo.drop_duplicates(subset=['data'])
-                
-                # Salva o arquivo atualizado
-                df_completo.to_csv('data/energia.csv', index=False)
-                print(f"Adicionados {len(df_novo)} novos registros de energia")
-            else:
-                print("Nenhum dado novo de energia encontrado")
+                # Acrescenta só os novos registros, sem reescrever o histórico
+                novos_registros = df_novo[['data', 'valor']].drop_duplicates(subset=['data']).sort_values('data')
+                adicionados = acrescentar_linhas_csv('data/energia.csv', novos_registros)
+                print(f"Adicionados {adicionados} novos registros de energia")
+                return adicionados
+            
+            print("Nenhum dado novo de energia encontrado")
+            return 0
                 
         except Exception as e:
             print(f"Erro ao baixar arquivo da ANEEL: {e}")
             print("Tentando método alternativo...")
             
-            # Método alternativo usando a API
+            # Método alternativo usando a API, paginada por offset
             api_url = "https://dadosabertos.aneel.gov.br/api/3/action/datastore_search"
             params = {
                 'resource_id': '5e9f0d17-0245-4c93-8c0c-2c5b0bdc5014',
-                'limit': 5000,
                 'sort': 'PeriodoReferencia desc'
             }
             
-            response = requests.get(api_url, params=params)
-            response.raise_for_status()
-            dados = response.json()['result']['records']
-            
             novos_registros = []
-            for registro in dados:
+            for registro in paginar_ckan(api_url, params):
                 data = pd.to_datetime(registro['PeriodoReferencia'])
-                if data > ultima_data:
-                    valor = float(registro['ValorTarifaResidencial'].replace(',', '.'))
-                    novos_registros.append({
-                        'data': data,
-                        'valor': valor
-                    })
+                if data <= ultima_data:
+                    # Ordenado do mais recente para o mais antigo: o resto já está gravado
+                    break
+                valor = float(str(registro['ValorTarifaResidencial']).replace(',', '.'))
+                novos_registros.append({
+                    'data': data,
+                    'valor': valor
+                })
             
             if novos_registros:
-                df_novos = pd.DataFrame(novos_registros)
-                df_completo = pd.concat([df_atual, df_novos])
-                df_completo = df_completo.sort_values('data')
-                df_completo = df_completo.drop_duplicates(subset=['data'])
-                df_completo.to_csv('data/energia.csv', index=False)
-                print(f"Adicionados {len(novos_registros)} novos registros de energia (método alternativo)")
-            else:
-                print("Nenhum dado novo de energia encontrado (método alternativo)")
+                df_novos = pd.DataFrame(novos_registros).drop_duplicates(subset=['data']).sort_values('data')
+                adicionados = acrescentar_linhas_csv('data/energia.csv', df_novos)
+                print(f"Adicionados {adicionados} novos registros de energia (método alternativo)")
+                return adicionados
+            
+            print("Nenhum dado novo de energia encontrado (método alternativo)")
+            return 0
             
     except Exception as e:
         print(f"Erro ao atualizar dados da energia: {e}")
         import traceback
         print(traceback.format_exc())
+        raise
+
+# Atualizadores de cada fonte e o tempo máximo (em segundos) que cada um pode levar
+FONTES = {
+    'gasolina': (atualizar_gasolina, 120),
+    'fipezap': (atualizar_fipezap, 120),
+    'energia': (atualizar_dados_energia, 300),
+    'plano_saude': (atualizar_plano_saude, 120),
+    'cesta_basica': (atualizar_cesta_basica, 120),
+}
+
+def cronometrar(nome, funcao):
+    """Executa o atualizador e retorna (situação, registros novos, segundos gastos)"""
+    inicio = time.monotonic()
+    try:
+        registros = funcao()
+    except Exception as e:
+        print(f"Erro ao atualizar {nome}: {e}")
+        return 'erro', None, time.monotonic() - inicio
+    
+    # Todo atualizador informa quantos registros gravou; sem isso, não dá para dizer que deu certo
+    if not isinstance(registros, int):
+        print(f"Atualizador de {nome} não informou os registros gravados")
+        return 'erro', None, time.monotonic() - inicio
+    return 'ok', registros, time.monotonic() - inicio
+
+def executar_atualizacoes(fontes=FONTES):
+    """
+    Roda os atualizadores das fontes em paralelo (cada um escreve só o seu CSV) e
+    espera cada um até o seu timeout. Retorna {fonte: (situação, registros, segundos)}.
+    """
+    inicio = time.monotonic()
+    resultados = {}
+    threads = {}
+    for nome, (funcao, _) in fontes.items():
+        # Threads daemon: quem estourar o timeout não segura o fim do processo
+        thread = threading.Thread(
+            target=lambda nome=nome, funcao=funcao: resultados.__setitem__(nome, cronometrar(nome, funcao)),
+            name=f'atualizacao-{nome}',
+            daemon=True
+        )
+        thread.start()
+        threads[nome] = thread
+    
+    relatorio = {}
+    for nome, thread in threads.items():
+        # O orçamento conta a partir do disparo, então as fontes correm em paralelo
+        limite = fontes[nome][1]
+        thread.join(max(0, limite - (time.monotonic() - inicio)))
+        if thread.is_alive():
+            # A escrita atômica garante que um CSV interrompido nunca fica pela metade
+            print(f"Timeout de {limite}s excedido ao atualizar {nome}")
+            relatorio[nome] = ('timeout', None, time.monotonic() - inicio)
+        else:
+            relatorio[nome] = resultados[nome]
+    
+    return relatorio
+
+def imprimir_relatorio(relatorio, duracao_total):
+    print("\nResumo da atualização:")
+    for nome, (situacao, registros, duracao) in relatorio.items():
+        novos = '-' if registros is None else registros
+        print(f"  {nome:<14} {situacao:<8} novos: {novos:<5} {duracao:6.1f}s")
+    print(f"  {'total':<14} {'':<8} {'':<12} {duracao_total:6.1f}s")
 
 def main():
     print(f"Iniciando atualização de dados: {datetime.now()}")
+    inicio = time.monotonic()
     verificar_arquivos()
-    atualizar_gasolina()
-    atualizar_fipezap()
-    atualizar_dados_energia()
-    atualizar_plano_saude()
-    atualizar_cesta_basica()
+    relatorio = executar_atualizacoes()
+    imprimir_relatorio(relatorio, time.monotonic() - inicio)
+    
+    falhas = [nome for nome, (situacao, _, _) in relatorio.items() if situacao != 'ok']
+    if falhas:
+        print(f"Atualização concluída com falhas em: {', '.join(falhas)}")
+        # Código de saída diferente de zero para o agendador (cron/CI) perceber a falha
+        sys.exit(1)
     print("Atualização concluída!")
 
 if __name__ == "__main__":
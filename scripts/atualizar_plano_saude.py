@@ -1,8 +1,13 @@
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 import logging
+import os
+import sys
+
+# Permite importar utils/ ao rodar como python scripts/<arquivo>.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.http_client import http_get
 
 def atualizar_plano_saude():
     """Atualiza dados dos reajustes de planos de saúde"""
@@ -10,7 +15,7 @@ def atualizar_plano_saude():
         # URL da página de notícias da ANS sobre reajustes
         url = "https://www.gov.br/ans/pt-br/assuntos/noticias/beneficiarios"
         
-        response = requests.get(url)
+        response = http_get(url)
         soup = BeautifulSoup(response.content, 'html.parser')
         
         # Busca notícias sobre reajuste
@@ -27,7 +32,7 @@ def atualizar_plano_saude():
                 print(f"Link: {link}")
                 
                 # Busca o valor do reajuste na página da notícia
-                response_noticia = requests.get(link)
+                response_noticia = http_get(link)
                 soup_noticia = BeautifulSoup(response_noticia.content, 'html.parser')
                 
                 # Procura o valor do reajuste no texto
@@ -36,6 +41,10 @@ def atualizar_plano_saude():
                 
                 # Atualiza o CSV com o novo reajuste
                 # Implementar lógica de atualização
+        
+        # Ainda só verifica as notícias; nenhum registro é gravado
+        return 0
                 
     except Exception as e:
-        print(f"Erro ao verificar reajustes: {e}") 
\ No newline at end of file
+        print(f"Erro ao verificar reajustes: {e}")
+        return 0 
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+import sys
+from datetime import datetime
+
+# Permite importar app e utils/ ao rodar como python scripts/<arquivo>.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import materializar_todos
+
+def main():
+    """Grava em data/materializado/ a série mensal final de todos os indicadores"""
+    print(f"Iniciando materialização das séries: {datetime.now()}")
+    materializar_todos()
+
+if __name__ == "__main__":
+    main()
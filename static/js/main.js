@@ -77,8 +77,20 @@ function atualizarGrafico() {
     loading.style.fontSize = '20px';
     grafico.appendChild(loading);
 
-    fetch(`/dados?indicador1=${indicador1}&indicador2=${indicador2}&periodo=${periodo}`)
-        .then(response => response.json())
+    // Não faz sentido receber mais pontos do que pixels disponíveis no gráfico
+    const maxPoints = Math.max(200, Math.round(grafico.clientWidth || 1000));
+
+    // Pede o formato binário colunar (eixo mensal contínuo, bem menor que o JSON);
+    // se o servidor responder JSON (ex.: série reduzida por max_points), usa o JSON mesmo
+    fetch(`/dados?indicador1=${indicador1}&indicador2=${indicador2}&periodo=${periodo}&max_points=${maxPoints}`, {
+        headers: { 'Accept': `${MIMETYPE_SERIES}, application/json;q=0.5` }
+    })
+        .then(response => {
+            if ((response.headers.get('Content-Type') || '').startsWith(MIMETYPE_SERIES)) {
+                return response.arrayBuffer().then(decodificarSeries);
+            }
+            return response.json();
+        })
         .then(data => {
             // Remove loading
             grafico.style.opacity = '1';
@@ -115,7 +127,7 @@ function atualizarGrafico() {
             // Adiciona a sombra como uma segunda linha logo abaixo
             const shadow1 = {
                 x: dates,
-                y: data.valores1.map(v => v * 0.995),
+                y: data.valores1.map(v => v === null ? null : v * 0.995),
                 name: data.indicador1 + '_shadow',
                 type: 'scatter',
                 visible: check1 ? true : 'legendonly',
@@ -148,7 +160,7 @@ function atualizarGrafico() {
             // Adiciona a sombra como uma segunda linha logo abaixo
             const shadow2 = {
                 x: dates,
-                y: data.valores2.map(v => v * 0.995),
+                y: data.valores2.map(v => v === null ? null : v * 0.995),
                 name: data.indicador2 + '_shadow',
                 type: 'scatter',
                 visible: check2 ? true : 'legendonly',
@@ -163,9 +175,18 @@ function atualizarGrafico() {
                 hoverinfo: 'skip'
             };
 
+            // Avisa quando alguma série veio de uma cópia antiga (fonte lenta ou fora do ar)
+            const desatualizados = Object.entries(data.atualizacao || {})
+                .filter(([, info]) => info.desatualizado && info.obtido_em)
+                .map(([nome, info]) => `${nome} (${formatarData(info.obtido_em)})`);
+            if (desatualizados.length) {
+                console.warn('Dados desatualizados:', desatualizados.join(', '));
+            }
+
             const layout = {
                 title: {
-                    text: 'Comparação de Indicadores',
+                    text: 'Comparação de Indicadores' +
+                        (desatualizados.length ? `<br><sub>Dados desatualizados: ${desatualizados.join(', ')}</sub>` : ''),
                     font: {
                         color: '#ffffff',
                         size: 24
@@ -316,6 +337,46 @@ function formatarValor(indicador, valor) {
     return formatador(valor);
 }
 
+// Formato binário das séries (ver utils/formato_binario.py)
+const MIMETYPE_SERIES = 'application/x-comparador-series';
+
+// Decodifica o formato binário no mesmo objeto que /dados devolve em JSON
+function decodificarSeries(buffer) {
+    const visao = new DataView(buffer);
+    const assinatura = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (assinatura !== 'CIS1' || visao.getUint8(4) !== 1) {
+        throw new Error('Formato de séries desconhecido');
+    }
+    const bytesPorValor = visao.getUint8(5);
+    const nSeries = visao.getUint16(6, true);
+    const mesInicial = visao.getInt32(8, true);
+    const nMeses = visao.getUint32(12, true);
+    const tamanhoMeta = visao.getUint32(16, true);
+
+    const meta = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 20, tamanhoMeta)));
+    let inicio = 20 + tamanhoMeta;
+    inicio += (8 - inicio % 8) % 8;
+
+    const Tipo = bytesPorValor === 4 ? Float32Array : Float64Array;
+    const series = [];
+    for (let i = 0; i < nSeries; i++) {
+        const valores = new Tipo(buffer, inicio + i * nMeses * bytesPorValor, nMeses);
+        // NaN marca mês sem dado: vira null, que o Plotly desenha como lacuna
+        series.push(Array.from(valores, v => Number.isNaN(v) ? null : v));
+    }
+
+    // O eixo é contínuo: as datas saem do mês inicial (ano * 12 + mês - 1). Usa o
+    // dia 15 para que o fuso horário local não empurre a data para o mês anterior
+    const datas = [];
+    for (let i = 0; i < nMeses; i++) {
+        const ano = Math.floor((mesInicial + i) / 12);
+        const mes = (mesInicial + i) % 12 + 1;
+        datas.push(`${ano}-${String(mes).padStart(2, '0')}-15`);
+    }
+
+    return { ...meta, datas, valores1: series[0] || [], valores2: series[1] || [] };
+}
+
 // Função para formatar a data corretamente
 function formatarData(data) {
     const dataObj = new Date(data);
@@ -0,0 +1,90 @@
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+_trava_local = threading.Lock()
+
+# os.umask só pode ser lida trocando o valor; lida uma vez na importação, antes de
+# haver outras threads criando arquivos
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _permissao_destino(caminho):
+    """Permissão que o arquivo deve ter ao ser regravado: a atual, ou a padrão se não existir"""
+    try:
+        return stat.S_IMODE(os.stat(caminho).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+def escrever_atomico(caminho, conteudo):
+    """
+    Grava o conteúdo (bytes ou str) num arquivo temporário da mesma pasta e troca
+    pelo destino com os.replace, para que leitores nunca vejam um arquivo pela metade.
+    """
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(pasta, exist_ok=True)
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode('utf-8')
+
+    descritor, temporario = tempfile.mkstemp(dir=pasta, prefix='.tmp-', suffix=os.path.basename(caminho))
+    try:
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(conteudo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        # mkstemp cria com 0600; o arquivo final mantém a permissão do destino
+        # (ou a padrão de um arquivo novo, 0666 menos a umask)
+        os.chmod(temporario, _permissao_destino(caminho))
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+def acrescentar_linhas_csv(caminho, novos, colunas=('data', 'valor')):
+    """
+    Acrescenta as linhas de novos (DataFrame) ao fim do CSV sem reler nem reordenar o
+    que já existe, trocando o arquivo de uma vez com escrever_atomico. Cria o arquivo
+    com cabeçalho se ele não existir. Retorna o número de linhas acrescentadas.
+    """
+    if novos.empty:
+        return 0
+
+    try:
+        with open(caminho, 'rb') as arquivo:
+            atual = arquivo.read()
+    except FileNotFoundError:
+        atual = b''
+
+    linhas = novos.to_csv(index=False, header=not atual, columns=list(colunas), date_format='%Y-%m-%d',
+                          lineterminator='\n')
+    if atual and not atual.endswith(b'\n'):
+        atual += b'\n'
+    escrever_atomico(caminho, atual + linhas.encode('utf-8'))
+    return len(novos)
+
+@contextmanager
+def travar_arquivo(caminho):
+    """
+    Trava exclusiva entre processos (flock) sobre um arquivo auxiliar, para serializar
+    quem lê, altera e regrava um mesmo arquivo. Sem fcntl, trava só dentro do processo.
+    """
+    if fcntl is None:
+        with _trava_local:
+            yield
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, 'a+b') as arquivo:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
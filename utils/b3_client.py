@@ -1,4 +1,4 @@
-import requests
+from utils.http_client import http_get
 from datetime import datetime, timedelta
 import pandas as pd
 from bs4 import BeautifulSoup
@@ -17,7 +17,7 @@ class B3Client:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            response = requests.get(self.base_url, headers=headers)
+            response = http_get(self.base_url, headers=headers)
             if response.status_code == 200:
                 soup = BeautifulSoup(response.text, 'html.parser')
                 table = soup.find('table', {'id': 'tb_principal'})
@@ -0,0 +1,53 @@
+import logging
+import os
+import threading
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class RegistroCSV:
+    """
+    Mantém em memória as séries dos CSVs de data/ já convertidas para float64 e
+    indexadas pelo último dia do mês. Cada arquivo só é lido de novo quando o
+    mtime muda (por exemplo, depois de rodar os scripts de atualização).
+    """
+
+    def __init__(self, pasta='data'):
+        self.pasta = pasta
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _carregar(self, caminho):
+        df = pd.read_csv(caminho, usecols=['data', 'valor'], dtype={'valor': 'float64'})
+        datas = pd.to_datetime(df['data']) + pd.offsets.MonthEnd(0)
+        serie = pd.Series(df['valor'].to_numpy(), index=pd.DatetimeIndex(datas), name='valor')
+        serie = serie[serie.index.notna()].sort_index()
+        return serie
+
+    def serie(self, arquivo):
+        """Retorna a série (pd.Series float64 com índice mensal ordenado) do arquivo"""
+        caminho = os.path.join(self.pasta, arquivo)
+        mtime = os.stat(caminho).st_mtime_ns
+
+        carregada = self._series.get(arquivo)
+        if carregada is not None and carregada[0] == mtime:
+            return carregada[1]
+
+        with self._lock:
+            carregada = self._series.get(arquivo)
+            if carregada is None or carregada[0] != mtime:
+                logger.info(f"Carregando {caminho} na memória")
+                carregada = (mtime, self._carregar(caminho))
+                self._series[arquivo] = carregada
+            return carregada[1]
+
+    def fatia(self, arquivo, data_inicial, data_final):
+        """Recorta a série do arquivo entre as datas (busca binária no índice ordenado)"""
+        return self.serie(arquivo).loc[data_inicial:data_final]
+
+    def precarregar(self, arquivos):
+        for arquivo in arquivos:
+            try:
+                self.serie(arquivo)
+            except Exception as e:
+                logger.error(f"Erro ao carregar {arquivo}: {str(e)}")
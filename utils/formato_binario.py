@@ -0,0 +1,76 @@
+"""
+Formato binário colunar das séries alinhadas (application/x-comparador-series).
+
+Todos os campos são little-endian:
+
+    0   4s   assinatura b'CIS1'
+    4   u8   versão do formato (1)
+    5   u8   bytes por valor (4 = float32, 8 = float64)
+    6   u16  número de séries
+    8   i32  mês inicial, contado como ano * 12 + (mês - 1)
+    12  u32  número de meses (o passo é sempre de um mês)
+    16  u32  tamanho do bloco de metadados em bytes
+    20  ...  metadados em JSON UTF-8 (inclui 'series' com os nomes, na ordem dos blocos)
+    ...      preenchimento com zeros até múltiplo de 8
+    ...      um bloco de valores por série, cada um com 'número de meses' valores;
+             meses sem dado são NaN
+"""
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+MIMETYPE = 'application/x-comparador-series'
+ASSINATURA = b'CIS1'
+VERSAO = 1
+CABECALHO = struct.Struct('<4sBBHiII')
+
+def codificar_series(tabela, nomes, metadados=None, bytes_por_valor=8):
+    """
+    Codifica uma tabela alinhada (índice mensal, uma coluna por série, na ordem de
+    nomes) num eixo mensal contínuo: meses ausentes entre o primeiro e o último
+    viram NaN, então as datas se resumem ao mês inicial e à contagem de meses.
+    """
+    if bytes_por_valor not in (4, 8):
+        raise ValueError("bytes_por_valor deve ser 4 ou 8")
+    dtype = np.dtype('<f4') if bytes_por_valor == 4 else np.dtype('<f8')
+
+    if len(tabela):
+        meses = tabela.index.to_period('M')
+        inicio, fim = meses.min(), meses.max()
+        eixo = pd.period_range(inicio, fim, freq='M')
+        valores = tabela.set_axis(meses).reindex(eixo).to_numpy(dtype='float64').T
+        mes_inicial = inicio.year * 12 + inicio.month - 1
+    else:
+        eixo = []
+        valores = np.empty((tabela.shape[1], 0))
+        mes_inicial = 0
+
+    meta = dict(metadados or {})
+    meta['series'] = list(nomes)
+    meta = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+
+    cabecalho = CABECALHO.pack(ASSINATURA, VERSAO, bytes_por_valor, len(nomes), mes_inicial, len(eixo), len(meta))
+    preenchimento = b'\0' * (-(len(cabecalho) + len(meta)) % 8)
+    return cabecalho + meta + preenchimento + np.ascontiguousarray(valores, dtype=dtype).tobytes()
+
+def decodificar_series(corpo):
+    """Lê o formato de volta: retorna (DataFrame indexado pelo último dia do mês, metadados)"""
+    assinatura, versao, bytes_por_valor, n_series, mes_inicial, n_meses, tamanho_meta = CABECALHO.unpack_from(corpo)
+    if assinatura != ASSINATURA or versao != VERSAO:
+        raise ValueError("Conteúdo não está no formato binário de séries")
+
+    inicio_meta = CABECALHO.size
+    meta = json.loads(corpo[inicio_meta:inicio_meta + tamanho_meta].decode('utf-8'))
+    inicio_valores = inicio_meta + tamanho_meta
+    inicio_valores += -inicio_valores % 8
+
+    dtype = np.dtype('<f4') if bytes_por_valor == 4 else np.dtype('<f8')
+    valores = np.frombuffer(corpo, dtype=dtype, count=n_series * n_meses, offset=inicio_valores)
+    valores = valores.reshape(n_series, n_meses)
+
+    ano, mes = divmod(mes_inicial, 12)
+    indice = pd.period_range(pd.Period(year=ano, month=mes + 1, freq='M'), periods=n_meses, freq='M')
+    tabela = pd.DataFrame(valores.T.astype('float64'), index=indice.to_timestamp(how='end').normalize(),
+                          columns=meta['series'])
+    return tabela, meta
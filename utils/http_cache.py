@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from io import StringIO
+import pandas as pd
+from utils.arquivos import escrever_atomico
+from utils.http_client import http_get
+from utils import metricas
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Pasta onde ficam os corpos baixados e seus validadores (ETag/Last-Modified)
+PASTA_PADRAO = os.environ.get('HTTP_CACHE_DIR', 'data/cache/http')
+
+class CacheHTTP:
+    """
+    Cache de arquivos remotos com GET condicional. Guarda o corpo junto com o ETag e
+    o Last-Modified da resposta e, nas chamadas seguintes, envia If-None-Match /
+    If-Modified-Since: se o servidor responder 304, o corpo guardado é reaproveitado.
+    Um filtro opcional reduz o corpo antes de guardar (ex.: só as linhas do Brasil).
+    """
+
+    def __init__(self, pasta=PASTA_PADRAO):
+        self.pasta = pasta
+        self._memoria = {}
+        self._lock = threading.Lock()
+        self._voos = SingleFlight()
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, f'{chave}.json')
+
+    def _ler(self, chave):
+        with self._lock:
+            if chave in self._memoria:
+                return self._memoria[chave]
+        try:
+            with open(self._caminho(chave), encoding='utf-8') as arquivo:
+                entrada = json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._memoria[chave] = entrada
+        return entrada
+
+    def _gravar(self, chave, entrada):
+        escrever_atomico(self._caminho(chave), json.dumps(entrada))
+        with self._lock:
+            self._memoria[chave] = entrada
+
+    def obter_texto(self, url, chave, filtrar=None):
+        """
+        Retorna (texto, versao) do arquivo. A versão muda sempre que o servidor manda
+        um corpo novo. Se a revalidação falhar, devolve a última cópia guardada.
+        Chamadas simultâneas para a mesma chave compartilham uma única requisição.
+        """
+        return self._voos.executar(chave, self._revalidar, url, chave, filtrar)
+
+    def _revalidar(self, url, chave, filtrar):
+        entrada = self._ler(chave)
+        headers = {}
+        if entrada and entrada.get('url') == url:
+            if entrada.get('etag'):
+                headers['If-None-Match'] = entrada['etag']
+            if entrada.get('last_modified'):
+                headers['If-Modified-Since'] = entrada['last_modified']
+
+        try:
+            response = http_get(url, headers=headers)
+            if response.status_code == 304 and headers:
+                metricas.contar_cache('http', True)
+                return entrada['conteudo'], entrada['versao']
+            response.raise_for_status()
+            metricas.contar_cache('http', False)
+        except Exception as e:
+            if entrada:
+                logger.warning(f"Erro ao revalidar {url}, usando cópia guardada: {str(e)}")
+                return entrada['conteudo'], entrada['versao']
+            raise
+
+        conteudo = filtrar(response.text) if filtrar else response.text
+        entrada = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'versao': response.headers.get('ETag') or response.headers.get('Last-Modified') or hashlib.sha1(conteudo.encode('utf-8')).hexdigest(),
+            'conteudo': conteudo
+        }
+        self._gravar(chave, entrada)
+        return entrada['conteudo'], entrada['versao']
+
+    def obter_dataframe(self, url, chave, filtrar=None, **opcoes_csv):
+        """
+        Como obter_texto, mas devolve o CSV já lido. O DataFrame fica em memória
+        até a versão mudar, então um 304 não custa nenhum parsing. Retorna uma
+        cópia, que pode ser alterada à vontade por quem chamou.
+        """
+        conteudo, versao = self.obter_texto(url, chave, filtrar)
+        chave_df = ('df', chave)
+        with self._lock:
+            lido = self._memoria.get(chave_df)
+        if lido is None or lido[0] != versao:
+            with metricas.etapa('parse'):
+                lido = (versao, pd.read_csv(StringIO(conteudo), **opcoes_csv))
+            with self._lock:
+                self._memoria[chave_df] = lido
+        return lido[1].copy()
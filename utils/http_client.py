@@ -0,0 +1,81 @@
+import logging
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils import metricas
+
+logger = logging.getLogger(__name__)
+
+# Timeout padrão (conexão, leitura) em segundos, aplicado a toda requisição
+TIMEOUT_PADRAO = (3.05, 20)
+
+# Número de tentativas e limites do backoff exponencial entre elas (em segundos)
+TENTATIVAS_PADRAO = 3
+BACKOFF_BASE = 0.25
+BACKOFF_MAXIMO = 4.0
+
+# Conexões mantidas abertas (keep-alive) por host; acima disso as threads esperam na fila
+CONEXOES_POR_HOST = int(os.environ.get('HTTP_CONEXOES_POR_HOST', 10))
+
+# Respostas que indicam falha passageira do servidor e merecem nova tentativa
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+_sessao = None
+_lock_sessao = threading.Lock()
+
+def obter_sessao():
+    """Sessão HTTP única do processo, com pool de conexões por host"""
+    global _sessao
+    if _sessao is None:
+        with _lock_sessao:
+            if _sessao is None:
+                sessao = requests.Session()
+                adaptador = HTTPAdapter(
+                    pool_connections=16,
+                    pool_maxsize=CONEXOES_POR_HOST,
+                    pool_block=True,
+                    max_retries=0
+                )
+                sessao.mount('https://', adaptador)
+                sessao.mount('http://', adaptador)
+                _sessao = sessao
+    return _sessao
+
+def espera_backoff(tentativa):
+    """Espera antes da próxima tentativa: exponencial com jitter completo"""
+    return random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** tentativa))
+
+def com_retentativas(func, tentativas=TENTATIVAS_PADRAO, excecoes=(Exception,)):
+    """Executa func, repetindo em caso de uma das exceções com backoff exponencial"""
+    for tentativa in range(tentativas):
+        try:
+            return func()
+        except excecoes as e:
+            if tentativa == tentativas - 1:
+                raise
+            espera = espera_backoff(tentativa)
+            logger.warning(f"Tentativa {tentativa + 1} falhou ({e}), tentando novamente em {espera:.2f} segundos")
+            time.sleep(espera)
+
+def http_get(url, params=None, headers=None, timeout=TIMEOUT_PADRAO, tentativas=TENTATIVAS_PADRAO, stream=False):
+    """
+    GET pela sessão compartilhada. Erros de conexão, timeouts e os status de
+    STATUS_REPETIVEIS são repetidos com backoff; qualquer outra resposta é
+    devolvida como veio, cabendo a quem chama usar raise_for_status().
+    """
+    def fazer_requisicao():
+        # Cada tentativa conta como uma busca do indicador/fonte em carregamento
+        with metricas.etapa('busca'):
+            response = obter_sessao().get(url, params=params, headers=headers, timeout=timeout, stream=stream)
+        if response.status_code in STATUS_REPETIVEIS:
+            response.raise_for_status()
+        return response
+
+    return com_retentativas(
+        fazer_requisicao,
+        tentativas=tentativas,
+        excecoes=(requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError)
+    )
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from utils.arquivos import escrever_atomico, travar_arquivo
+from utils.snapshot import Snapshot, codificar_snapshot
+
+# Pasta dos artefatos: o snapshot com a série mensal final de todos os indicadores
+PASTA_PADRAO = os.environ.get('PASTA_MATERIALIZADO', 'data/materializado')
+NOME_SNAPSHOT = 'series.snapshot'
+
+class Materializados:
+    """
+    Guarda a série mensal final de cada indicador (já acumulada e reamostrada) num
+    único snapshot em data/materializado/ (formato em utils/snapshot.py). Cada worker
+    mapeia o arquivo em memória e as requisições só recortam o período; quem grava
+    regera o snapshot inteiro e o troca de uma vez com os.replace.
+    """
+
+    def __init__(self, pasta=PASTA_PADRAO):
+        self.pasta = pasta
+        self.caminho = os.path.join(pasta, NOME_SNAPSHOT)
+        self._snapshot = None
+        self._lidas = {}
+        self._lock = threading.Lock()
+
+    def _atual(self):
+        # Remapeia quando outro processo troca o arquivo (inode, mtime ou tamanho mudam)
+        try:
+            info = os.stat(self.caminho)
+        except OSError:
+            return None
+
+        identidade = (info.st_ino, info.st_mtime_ns, info.st_size)
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.identidade != identidade:
+            with self._lock:
+                if self._snapshot is None or self._snapshot.identidade != identidade:
+                    self._snapshot = Snapshot(self.caminho)
+                    self._lidas = {}
+                snapshot = self._snapshot
+        return snapshot
+
+    def salvar(self, indicador, serie):
+        self.salvar_varias({indicador: serie})
+
+    def salvar_varias(self, series):
+        """Grava as séries {indicador: pd.Series} mantendo as demais do snapshot atual"""
+        agora = time.time()
+        # A trava evita que dois workers regravando ao mesmo tempo percam a série um do outro
+        with travar_arquivo(self.caminho + '.lock'):
+            snapshot = self._atual()
+            todas = snapshot.series() if snapshot is not None else {}
+            for indicador, serie in series.items():
+                # Dados servidos de um histórico local (fonte fora do ar) mantêm a hora real
+                obtida_em = serie.attrs.get('obtida_em', agora)
+                serie = serie.copy()
+                serie.attrs['obtida_em'] = obtida_em
+                todas[indicador] = serie
+            escrever_atomico(self.caminho, codificar_snapshot(todas, gerado_em=agora))
+
+    def versao(self, indicador):
+        """Hora dos dados materializados do indicador (timestamp), ou None se ainda não existir"""
+        snapshot = self._atual()
+        return None if snapshot is None else snapshot.obtida_em(indicador)
+
+    def idade(self, indicador):
+        """Idade (em segundos) dos dados materializados do indicador, ou None"""
+        versao = self.versao(indicador)
+        return None if versao is None else time.time() - versao
+
+    def ler(self, indicador):
+        """Série mensal materializada (pd.Series float64 somente leitura, sem cópia)"""
+        snapshot = self._atual()
+        if snapshot is None:
+            return None
+
+        lidas = self._lidas
+        serie = lidas.get(indicador)
+        if serie is None:
+            serie = snapshot.serie(indicador)
+            if serie is not None and snapshot is self._snapshot:
+                lidas[indicador] = serie
+        return serie
@@ -0,0 +1,170 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Limites (em segundos) dos baldes dos histogramas de tempo
+LIMITES_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Rótulos (indicador, fonte) do carregamento em andamento na thread atual, para que
+# as camadas de baixo (HTTP, cache, histórico) não precisem recebê-los como parâmetro
+_rotulos = contextvars.ContextVar('rotulos_metricas', default={})
+
+# Lista que recebe as etapas medidas durante uma requisição perfilada (ou None)
+_coleta = contextvars.ContextVar('coleta_metricas', default=None)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _formatar_rotulos(nomes, valores, extra=()):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    pares += [f'{nome}="{_escapar(valor)}"' for nome, valor in extra]
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+class Contador:
+    """Contador crescente por combinação de rótulos (tipo counter do Prometheus)"""
+
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, quantidade=1, **rotulos):
+        chave = tuple(str(rotulos.get(nome, '')) for nome in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + quantidade
+
+    def exposicao(self):
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} counter']
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for chave, valor in valores:
+            linhas.append(f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {valor}')
+        return linhas
+
+class Histograma:
+    """Distribuição de valores em baldes cumulativos por combinação de rótulos (tipo histogram)"""
+
+    def __init__(self, nome, descricao, rotulos=(), limites=LIMITES_PADRAO):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(sorted(limites))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(str(rotulos.get(nome, '')) for nome in self.rotulos)
+        balde = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = {'baldes': [0] * (len(self.limites) + 1), 'soma': 0.0, 'total': 0}
+            serie['baldes'][balde] += 1
+            serie['soma'] += valor
+            serie['total'] += 1
+
+    def exposicao(self):
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} histogram']
+        with self._lock:
+            series = sorted((chave, dict(serie, baldes=list(serie['baldes']))) for chave, serie in self._series.items())
+        for chave, serie in series:
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float('inf'),), serie['baldes']):
+                acumulado += contagem
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                linhas.append(f'{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, [("le", le)])} {acumulado}')
+            linhas.append(f'{self.nome}_sum{_formatar_rotulos(self.rotulos, chave)} {serie["soma"]:.6f}')
+            linhas.append(f'{self.nome}_count{_formatar_rotulos(self.rotulos, chave)} {serie["total"]}')
+        return linhas
+
+class RegistroMetricas:
+    """Conjunto das métricas do processo, exportado no formato texto do Prometheus"""
+
+    def __init__(self):
+        self._metricas = []
+
+    def contador(self, nome, descricao, rotulos=()):
+        metrica = Contador(nome, descricao, rotulos)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nome, descricao, rotulos=(), limites=LIMITES_PADRAO):
+        metrica = Histograma(nome, descricao, rotulos, limites)
+        self._metricas.append(metrica)
+        return metrica
+
+    def exposicao(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.exposicao())
+        return '\n'.join(linhas) + '\n'
+
+# Registro padrão e as métricas do carregamento das séries. Cada worker do gunicorn
+# tem as suas; o Prometheus soma as séries dos workers na consulta.
+registro = RegistroMetricas()
+
+ETAPAS = registro.histograma(
+    'comparador_etapa_segundos',
+    'Tempo de cada etapa do carregamento das séries (busca, parse, transformacao, serializacao)',
+    ('indicador', 'fonte', 'etapa')
+)
+CACHES = registro.contador(
+    'comparador_cache_total',
+    'Consultas aos caches, por cache e resultado (acerto ou falta)',
+    ('cache', 'resultado', 'indicador')
+)
+REQUISICOES = registro.histograma(
+    'comparador_requisicao_segundos',
+    'Tempo total das requisições HTTP atendidas',
+    ('rota', 'status')
+)
+
+@contextmanager
+def rotulos(**novos):
+    """Define indicador/fonte (entre outros) para as medições feitas dentro do bloco"""
+    token = _rotulos.set({**_rotulos.get(), **novos})
+    try:
+        yield
+    finally:
+        _rotulos.reset(token)
+
+@contextmanager
+def etapa(nome, **extra):
+    """Mede o bloco como uma etapa do carregamento, com os rótulos atuais"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        atuais = {**_rotulos.get(), **extra}
+        ETAPAS.observar(duracao, etapa=nome, **atuais)
+        coleta = _coleta.get()
+        if coleta is not None:
+            coleta.append((atuais.get('indicador', ''), atuais.get('fonte', ''), nome, duracao))
+
+def contar_cache(cache, acertou, **extra):
+    """Registra um acerto (hit) ou uma falta (miss) no cache indicado"""
+    atuais = {**_rotulos.get(), **extra}
+    resultado = 'hit' if acertou else 'miss'
+    CACHES.incrementar(cache=cache, resultado=resultado, indicador=atuais.get('indicador', ''))
+    coleta = _coleta.get()
+    if coleta is not None:
+        coleta.append((atuais.get('indicador', ''), atuais.get('fonte', ''), f'cache {cache}: {resultado}', None))
+
+@contextmanager
+def coletar():
+    """Guarda numa lista as etapas e consultas a cache feitas no bloco (na thread atual)"""
+    lista = []
+    token = _coleta.set(lista)
+    try:
+        yield lista
+    finally:
+        _coleta.reset(token)
+
+def coletando():
+    """Indica se há uma coleta (requisição perfilada) ativa na thread atual"""
+    return _coleta.get() is not None
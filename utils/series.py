@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+
+def acumular_percentual(valores, janela=12):
+    """
+    Acumula uma série de variações percentuais (ex.: IPCA mensal) em janelas móveis.
+
+    Equivale a (1 + valores/100).rolling(janela).apply(np.prod) - 1, em %, mas é feito
+    sobre o array inteiro: soma acumulada de log(1 + v/100) e diferença entre as pontas
+    de cada janela. As primeiras janela-1 posições, e qualquer janela com valor ausente,
+    ficam NaN. Aceita pd.Series (mantém o índice) ou qualquer sequência numérica.
+    """
+    if janela < 1:
+        raise ValueError("janela deve ser de pelo menos 1 período")
+
+    x = np.asarray(valores, dtype='float64')
+    resultado = np.full(len(x), np.nan)
+
+    if len(x) >= janela:
+        fatores = np.log1p(x / 100)
+        invalidos = ~np.isfinite(fatores)
+        fatores[invalidos] = 0.0
+
+        soma = np.concatenate(([0.0], np.cumsum(fatores)))
+        contagem = np.concatenate(([0], np.cumsum(invalidos)))
+
+        acumulado = np.expm1(soma[janela:] - soma[:-janela]) * 100
+        acumulado[(contagem[janela:] - contagem[:-janela]) > 0] = np.nan
+        resultado[janela - 1:] = acumulado
+
+    if isinstance(valores, pd.Series):
+        return pd.Series(resultado, index=valores.index, name=valores.name)
+    return resultado
+
+def serie_vazia():
+    """Série sem pontos no formato interno (índice datetime64, valores float64)"""
+    return pd.Series([], index=pd.DatetimeIndex([]), dtype='float64', name='valor')
+
+def criar_serie(datas, valores):
+    """
+    Monta a série no formato interno usado pelos loaders: pd.Series float64 com
+    DatetimeIndex ordenado. Valores não numéricos viram NaN e são descartados.
+    """
+    serie = pd.Series(
+        pd.to_numeric(np.asarray(valores), errors='coerce').astype('float64'),
+        index=pd.DatetimeIndex(datas),
+        name='valor'
+    )
+    serie = serie[serie.index.notna() & serie.notna()]
+    if not serie.index.is_monotonic_increasing:
+        serie = serie.sort_index(kind='stable')
+    return serie
+
+def serie_para_listas(serie):
+    """Converte a série para as listas (datas ISO, valores) devolvidas em JSON"""
+    return serie.index.strftime('%Y-%m-%d').tolist(), serie.tolist()
+
+# Políticas de alinhamento aceitas por alinhar_series
+POLITICAS_ALINHAMENTO = ('outer', 'inner', 'last')
+
+def para_mensal(serie):
+    """Reduz a série a um ponto por mês de calendário (último valor, no último dia do mês)"""
+    if serie.empty:
+        return serie
+    return serie.resample('ME').last().dropna()
+
+def alinhar_series(series, politica='outer'):
+    """
+    Junta as séries (dict nome -> pd.Series, de qualquer frequência) num único eixo
+    mensal, casando os pontos pelo mês de calendário. Políticas:
+
+    - 'outer': união dos meses; cada série é propagada (forward-fill) entre a sua
+      primeira e a sua última observação, e fica NaN fora desse intervalo.
+    - 'inner': só os meses em que todas as séries têm valor.
+    - 'last': meses da primeira série (referência); as demais usam a última
+      observação disponível até cada mês, mesmo que já tenham terminado.
+
+    Retorna um DataFrame indexado pelo último dia de cada mês, uma coluna por série.
+    """
+    if politica not in POLITICAS_ALINHAMENTO:
+        raise ValueError(f"Política de alinhamento inválida: {politica}")
+
+    mensais = {nome: para_mensal(serie) for nome, serie in series.items()}
+    if not mensais:
+        return pd.DataFrame(index=pd.DatetimeIndex([]))
+
+    tabela = pd.concat(mensais, axis=1, join='inner' if politica == 'inner' else 'outer').sort_index()
+
+    if politica == 'outer':
+        fim = np.array(
+            [serie.index[-1] if not serie.empty else pd.Timestamp.min for serie in mensais.values()],
+            dtype='datetime64[ns]'
+        )
+        depois_do_fim = tabela.index.to_numpy()[:, None] > fim[None, :]
+        tabela = tabela.ffill().mask(depois_do_fim)
+    elif politica == 'last':
+        referencia = next(iter(mensais.values())).index
+        tabela = tabela.ffill().reindex(referencia)
+
+    return tabela
+
+def lttb_indices(x, y, max_pontos):
+    """
+    Escolhe até max_pontos posições de (x, y) pelo Largest-Triangle-Three-Buckets: mantém
+    o primeiro e o último ponto e, em cada balde intermediário, o ponto que forma o maior
+    triângulo com o ponto escolhido no balde anterior e a média do balde seguinte. Preserva
+    picos e vales bem melhor que pegar um ponto a cada k.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if max_pontos >= n or n <= 2:
+        return np.arange(n)
+    if max_pontos < 3:
+        raise ValueError("max_pontos deve ser pelo menos 3")
+
+    # Limites dos baldes intermediários (o primeiro e o último ponto ficam de fora)
+    limites = np.linspace(1, n - 1, max_pontos - 1).astype(int)
+    escolhidos = np.empty(max_pontos, dtype=int)
+    escolhidos[0] = 0
+    escolhidos[-1] = n - 1
+
+    anterior = 0
+    for i in range(max_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        if i + 2 < len(limites):
+            prox_inicio, prox_fim = limites[i + 1], limites[i + 2]
+            media_x = x[prox_inicio:prox_fim].mean()
+            media_y = y[prox_inicio:prox_fim].mean()
+        else:
+            media_x, media_y = x[-1], y[-1]
+
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+
+    return escolhidos
+
+def reduzir_pontos(tabela, max_pontos):
+    """
+    Reduz uma tabela alinhada (saída de alinhar_series) a no máximo max_pontos linhas,
+    mantendo o eixo de datas compartilhado: cada coluna escolhe seus pontos por LTTB
+    com uma fatia do orçamento e ficam as linhas escolhidas por alguma delas.
+    """
+    if len(tabela) <= max_pontos or tabela.shape[1] == 0:
+        return tabela
+
+    orcamento = max(3, max_pontos // tabela.shape[1])
+    x = tabela.index.asi8.astype('float64')
+    linhas = []
+    for coluna in tabela.columns:
+        y = tabela[coluna].to_numpy(dtype='float64')
+        validos = np.flatnonzero(~np.isnan(y))
+        if len(validos):
+            linhas.append(validos[lttb_indices(x[validos], y[validos], orcamento)])
+
+    if not linhas:
+        return tabela.iloc[:0]
+    linhas = np.unique(np.concatenate(linhas))
+    if len(linhas) > max_pontos:
+        # Com mais de max_pontos // 3 colunas, o mínimo de 3 pontos por coluna estoura o
+        # orçamento: fica um subconjunto espaçado das linhas escolhidas, com as duas pontas
+        linhas = linhas[np.unique(np.linspace(0, len(linhas) - 1, max_pontos).round().astype(int))]
+    return tabela.iloc[linhas]
+
+def valores_para_json(valores):
+    """Converte um array float para lista, trocando NaN por None (null no JSON)"""
+    valores = np.asarray(valores, dtype='float64')
+    lista = valores.astype(object)
+    lista[np.isnan(valores)] = None
+    return lista.tolist()
+
+def estatisticas_moveis(y, x, janela=12):
+    """
+    Correlação, beta e spread de y contra x (arrays alinhados, mesmo eixo) em janelas
+    móveis de janela pontos. Médias, variâncias e covariância saem de somas acumuladas
+    de x, y, x², y² e xy (diferença entre as pontas de cada janela), sem laço em Python.
+    O beta é cov(x, y) / var(x); o spread é y - x ponto a ponto. Janelas com algum NaN,
+    e correlação/beta de janelas em que uma das séries fica constante, ficam NaN.
+    """
+    if janela < 2:
+        raise ValueError("janela deve ser de pelo menos 2 períodos")
+
+    y = np.asarray(y, dtype='float64')
+    x = np.asarray(x, dtype='float64')
+    correlacao = np.full(len(x), np.nan)
+    beta = np.full(len(x), np.nan)
+
+    if len(x) >= janela:
+        invalidos = np.isnan(x) | np.isnan(y)
+        validos = ~invalidos
+        # Centraliza antes de acumular para não perder precisão nas somas de quadrados
+        xc = np.where(invalidos, 0.0, x - (x[validos].mean() if validos.any() else 0.0))
+        yc = np.where(invalidos, 0.0, y - (y[validos].mean() if validos.any() else 0.0))
+
+        def somas_moveis(valores):
+            acumulado = np.concatenate(([0.0], np.cumsum(valores)))
+            return acumulado[janela:] - acumulado[:-janela]
+
+        sx, sy = somas_moveis(xc), somas_moveis(yc)
+        var_x = somas_moveis(xc * xc) / janela - (sx / janela) ** 2
+        var_y = somas_moveis(yc * yc) / janela - (sy / janela) ** 2
+        cov = somas_moveis(xc * yc) / janela - (sx / janela) * (sy / janela)
+
+        # Variância que é só resíduo de arredondamento conta como série constante
+        constante_x = var_x <= 1e-10 * np.max(xc * xc)
+        constante_y = var_y <= 1e-10 * np.max(yc * yc)
+        com_falta = somas_moveis(invalidos.astype('float64')) > 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+            b = cov / var_x
+        r[constante_x | constante_y | com_falta] = np.nan
+        b[constante_x | com_falta] = np.nan
+        correlacao[janela - 1:] = r
+        beta[janela - 1:] = b
+
+    return {'correlacao': correlacao, 'beta': beta, 'spread': y - x}
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Banco local compartilhado entre processos (workers do gunicorn) e reinícios
+CAMINHO_PADRAO = os.environ.get('SERIES_DB', 'data/cache/series.sqlite')
+
+# Intervalo mínimo entre duas buscas da mesma série no BCB (em segundos)
+INTERVALO_ATUALIZACAO = int(os.environ.get('INTERVALO_ATUALIZACAO_BCB', 6 * 3600))
+
+class SeriesStore:
+    """
+    Guarda o histórico das séries do SGS em SQLite e responde qualquer janela de datas
+    a partir dele. Cada série registra o intervalo já coberto e quando foi buscada pela
+    última vez, para que o BCB só seja consultado quando a janela não estiver coberta
+    ou quando os dados estiverem mais velhos que o intervalo de atualização.
+    """
+
+    def __init__(self, caminho=CAMINHO_PADRAO, intervalo_atualizacao=INTERVALO_ATUALIZACAO):
+        self.caminho = caminho
+        self.intervalo_atualizacao = intervalo_atualizacao
+        self._local = threading.local()
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._criar_tabelas()
+
+    def _conexao(self):
+        # sqlite3 não compartilha conexões entre threads, então cada thread abre a sua
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao = conexao
+        return conexao
+
+    def _criar_tabelas(self):
+        with self._conexao() as conexao:
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS observacoes (
+                    codigo TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    valor REAL,
+                    PRIMARY KEY (codigo, data)
+                ) WITHOUT ROWID
+            """)
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS series (
+                    codigo TEXT PRIMARY KEY,
+                    inicio_coberto TEXT NOT NULL,
+                    fim_coberto TEXT NOT NULL,
+                    atualizado_em REAL NOT NULL
+                )
+            """)
+
+    def cobertura(self, codigo):
+        """Retorna (inicio_coberto, fim_coberto, atualizado_em) da série ou None"""
+        return self._conexao().execute(
+            'SELECT inicio_coberto, fim_coberto, atualizado_em FROM series WHERE codigo = ?',
+            (str(codigo),)
+        ).fetchone()
+
+    def ultima_data(self, codigo):
+        """Data (datetime) da observação mais recente guardada para a série, ou None"""
+        linha = self._conexao().execute(
+            'SELECT MAX(data) FROM observacoes WHERE codigo = ?', (str(codigo),)
+        ).fetchone()
+        if not linha or linha[0] is None:
+            return None
+        return datetime.strptime(linha[0], '%Y-%m-%d')
+
+    def janelas_pendentes(self, codigo, data_inicial, data_final):
+        """
+        Lista as janelas (data_inicial, data_final) que ainda precisam ser buscadas no BCB.
+        O começo só é baixado se a janela pedida for anterior ao que já está coberto, e o
+        final é sincronizado sempre que a série está desatualizada (mesmo que a última
+        sincronização tenha sido hoje), pedindo apenas os dias posteriores à última
+        observação guardada.
+        """
+        cobertura = self.cobertura(codigo)
+        if cobertura is None:
+            return [(data_inicial, data_final)]
+
+        inicio_coberto, fim_coberto, atualizado_em = cobertura
+        inicio_coberto = datetime.strptime(inicio_coberto, '%Y-%m-%d')
+        janelas = []
+
+        if data_inicial.date() < inicio_coberto.date():
+            janelas.append((data_inicial, inicio_coberto - timedelta(days=1)))
+
+        desatualizada = time.time() - atualizado_em > self.intervalo_atualizacao
+        if desatualizada:
+            # Recomeça da última observação (e não do fim coberto) para pegar valores
+            # publicados depois da última sincronização, inclusive no mesmo dia, e os que
+            # o BCB publica com atraso, como o IPCA do mês anterior
+            ultima = self.ultima_data(codigo) or datetime.strptime(fim_coberto, '%Y-%m-%d')
+            if data_final.date() > ultima.date():
+                janelas.append((ultima + timedelta(days=1), data_final))
+
+        return janelas
+
+    def precisa_buscar(self, codigo, data_inicial, data_final):
+        """Indica se a janela pedida não está coberta ou se a série está desatualizada"""
+        return bool(self.janelas_pendentes(codigo, data_inicial, data_final))
+
+    def salvar(self, codigo, dados, data_inicial, data_final):
+        """Grava os registros do SGS ({'data': 'dd/mm/YYYY', 'valor': '1.23'}) e amplia a cobertura"""
+        linhas = []
+        for item in dados:
+            try:
+                dia, mes, ano = item['data'].split('/')
+                linhas.append((str(codigo), f"{ano}-{mes}-{dia}", float(str(item['valor']).replace(',', '.'))))
+            except (KeyError, ValueError):
+                continue
+
+        inicio = data_inicial.strftime('%Y-%m-%d')
+        fim = data_final.strftime('%Y-%m-%d')
+        with self._conexao() as conexao:
+            conexao.executemany(
+                'INSERT OR REPLACE INTO observacoes (codigo, data, valor) VALUES (?, ?, ?)',
+                linhas
+            )
+            conexao.execute("""
+                INSERT INTO series (codigo, inicio_coberto, fim_coberto, atualizado_em)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(codigo) DO UPDATE SET
+                    inicio_coberto = MIN(inicio_coberto, excluded.inicio_coberto),
+                    fim_coberto = MAX(fim_coberto, excluded.fim_coberto),
+                    atualizado_em = CASE
+                        WHEN excluded.fim_coberto >= fim_coberto THEN excluded.atualizado_em
+                        ELSE atualizado_em
+                    END
+            """, (str(codigo), inicio, fim, time.time()))
+
+    def consultar_mensal(self, codigo, data_inicial, data_final):
+        """
+        Como consultar, mas só a última observação de cada mês: a agregação é feita no
+        SQLite, então séries diárias longas não chegam inteiras à memória
+        """
+        # Com um único MAX(), o SQLite devolve o valor da própria linha da data máxima
+        return self._conexao().execute(
+            """
+            SELECT MAX(data), valor FROM observacoes
+            WHERE codigo = ? AND data BETWEEN ? AND ?
+            GROUP BY substr(data, 1, 7)
+            ORDER BY 1
+            """,
+            (str(codigo), data_inicial.strftime('%Y-%m-%d'), data_final.strftime('%Y-%m-%d'))
+        ).fetchall()
+
+    def consultar(self, codigo, data_inicial, data_final):
+        """Retorna a lista de (data ISO, valor) da série dentro da janela, em ordem"""
+        return self._conexao().execute(
+            'SELECT data, valor FROM observacoes WHERE codigo = ? AND data BETWEEN ? AND ? ORDER BY data',
+            (str(codigo), data_inicial.strftime('%Y-%m-%d'), data_final.strftime('%Y-%m-%d'))
+        ).fetchall()
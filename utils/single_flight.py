@@ -0,0 +1,48 @@
+import threading
+
+class _Chamada:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+class SingleFlight:
+    """
+    Junta chamadas concorrentes com a mesma chave numa única execução: a primeira
+    thread executa a função e as que chegarem enquanto ela estiver em andamento
+    esperam e recebem o mesmo resultado (ou a mesma exceção). Depois que termina,
+    a chave é liberada e a próxima chamada executa de novo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+
+    def executar(self, chave, func, *args, **kwargs):
+        with self._lock:
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._em_andamento[chave] = chamada
+
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = func(*args, **kwargs)
+            return chamada.resultado
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            chamada.evento.set()
+
+    def em_andamento(self, chave):
+        with self._lock:
+            return chave in self._em_andamento
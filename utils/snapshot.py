@@ -0,0 +1,108 @@
+"""
+Snapshot das séries materializadas: um único arquivo somente leitura com o
+histórico mensal de todos os indicadores, mapeado em memória (mmap) por cada
+worker. As páginas ficam no cache do sistema operacional e são compartilhadas
+entre os processos, então a memória das séries não cresce com o número de workers.
+
+Todos os campos são little-endian:
+
+    0   8s   assinatura b'CISNAP01'
+    8   u32  versão do formato (1)
+    12  u32  número de séries
+    16  f8   hora da gravação (timestamp Unix)
+    24  u64  reservado (0)
+    32  ...  índice: uma entrada de 80 bytes por série
+                 48s  nome do indicador (UTF-8, completado com zeros)
+                 f8   hora em que a série foi obtida (timestamp Unix)
+                 u64  número de pontos
+                 u64  posição das datas (int64, nanossegundos desde 1970, datetime64[ns])
+                 u64  posição dos valores (float64)
+    ...      os arrays de datas e valores de cada série, alinhados em 8 bytes
+"""
+import mmap
+import os
+import struct
+import time
+import numpy as np
+import pandas as pd
+
+ASSINATURA = b'CISNAP01'
+VERSAO = 1
+CABECALHO = struct.Struct('<8sIIdQ')
+ENTRADA = struct.Struct('<48sdQQQ')
+
+def codificar_snapshot(series, gerado_em=None):
+    """
+    Monta o snapshot a partir de {indicador: pd.Series mensal}. A hora em que cada
+    série foi obtida vem de attrs['obtida_em'] (ou da hora da gravação).
+    """
+    gerado_em = time.time() if gerado_em is None else gerado_em
+    nomes = sorted(series)
+
+    posicao = CABECALHO.size + ENTRADA.size * len(nomes)
+    indice, blocos = [], []
+    for nome in nomes:
+        serie = series[nome]
+        codificado = nome.encode('utf-8')
+        if len(codificado) > 48:
+            raise ValueError(f"Nome de indicador longo demais para o snapshot: {nome}")
+
+        datas = np.ascontiguousarray(serie.index.to_numpy(dtype='datetime64[ns]'), dtype='<i8')
+        valores = np.ascontiguousarray(serie.to_numpy(dtype='float64'), dtype='<f8')
+        obtida_em = serie.attrs.get('obtida_em', gerado_em)
+
+        indice.append(ENTRADA.pack(codificado, obtida_em, len(serie), posicao, posicao + datas.nbytes))
+        blocos += [datas.tobytes(), valores.tobytes()]
+        posicao += datas.nbytes + valores.nbytes
+
+    cabecalho = CABECALHO.pack(ASSINATURA, VERSAO, len(nomes), gerado_em, 0)
+    return b''.join([cabecalho, *indice, *blocos])
+
+class Snapshot:
+    """
+    Snapshot aberto com mmap. As séries devolvidas apontam direto para as páginas
+    mapeadas (sem cópia) e são somente leitura; o mapeamento continua válido mesmo
+    depois de o arquivo ser trocado, enquanto alguma série o referenciar.
+    """
+
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            info = os.fstat(arquivo.fileno())
+            # Identifica o arquivo aberto; muda quando o snapshot é trocado com os.replace
+            self.identidade = (info.st_ino, info.st_mtime_ns, info.st_size)
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        assinatura, versao, n_series, self.gerado_em, _ = CABECALHO.unpack_from(self._mapa)
+        if assinatura != ASSINATURA or versao != VERSAO:
+            raise ValueError(f"{caminho} não está no formato de snapshot de séries")
+
+        self._indice = {}
+        for i in range(n_series):
+            nome, obtida_em, n_pontos, pos_datas, pos_valores = ENTRADA.unpack_from(
+                self._mapa, CABECALHO.size + i * ENTRADA.size
+            )
+            self._indice[nome.rstrip(b'\0').decode('utf-8')] = (obtida_em, n_pontos, pos_datas, pos_valores)
+
+    def nomes(self):
+        return list(self._indice)
+
+    def obtida_em(self, nome):
+        """Hora (timestamp) em que a série foi obtida, ou None se não estiver no snapshot"""
+        entrada = self._indice.get(nome)
+        return None if entrada is None else entrada[0]
+
+    def serie(self, nome):
+        """pd.Series float64 sobre as páginas mapeadas, ou None se não estiver no snapshot"""
+        entrada = self._indice.get(nome)
+        if entrada is None:
+            return None
+
+        obtida_em, n_pontos, pos_datas, pos_valores = entrada
+        datas = np.frombuffer(self._mapa, dtype='<M8[ns]', count=n_pontos, offset=pos_datas)
+        valores = np.frombuffer(self._mapa, dtype='<f8', count=n_pontos, offset=pos_valores)
+        serie = pd.Series(valores, index=pd.DatetimeIndex(datas, copy=False), name='valor', copy=False)
+        serie.attrs['obtida_em'] = obtida_em
+        return serie
+
+    def series(self):
+        return {nome: self.serie(nome) for nome in self._indice}
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+class UltimasCopias:
+    """
+    Guarda a última cópia boa de cada série e a serve na hora, mesmo vencida
+    (stale-while-revalidate). Uma thread em segundo plano recarrega as cópias
+    vencidas; se a fonte falhar ou vier vazia, a cópia anterior continua valendo
+    e o erro fica registrado para ser informado na resposta.
+    """
+
+    def __init__(self, carregar, validade=900, intervalo_verificacao=30, intervalo_retentativa=120,
+                 abandono=24 * 3600):
+        # carregar(chave) -> pd.Series; uma série vazia conta como falha
+        self._carregar = carregar
+        self.validade = validade
+        self.intervalo_verificacao = intervalo_verificacao
+        self.intervalo_retentativa = intervalo_retentativa
+        self.abandono = abandono
+
+        self._copias = {}
+        self._voos = SingleFlight()
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+
+    def _iniciar_agendador(self):
+        # Inicia sob demanda, já dentro do processo do worker (depois do fork)
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name='atualizador-series', daemon=True)
+                    self._thread.start()
+
+    def _vencida(self, copia, agora):
+        # Depois de uma falha, espera intervalo_retentativa antes de tentar de novo
+        if copia['erro'] is not None and agora - copia['tentativa_em'] < self.intervalo_retentativa:
+            return False
+        return copia['obtida_em'] is None or agora - copia['obtida_em'] > self.validade
+
+    def atualizar(self, chave):
+        """Recarrega a série agora; quem pedir a mesma chave enquanto isso espera o mesmo carregamento"""
+        self._voos.executar(chave, self._atualizar, chave)
+
+    def _atualizar(self, chave):
+        # Mantém a cópia anterior se a fonte falhar. A série pode trazer em
+        # attrs['obtida_em'] a hora real dos dados (ex.: lida de um artefato em disco)
+        inicio = time.time()
+        try:
+            serie, erro = self._carregar(chave), None
+            if serie is None or serie.empty:
+                erro = 'fonte não retornou dados'
+        except Exception as e:
+            serie, erro = None, str(e)
+
+        obtida_em = None
+        if serie is not None and not serie.empty:
+            obtida_em = serie.attrs.get('obtida_em', inicio)
+            if erro is None and inicio - obtida_em > self.validade:
+                erro = 'fonte não atualizou; servindo a última cópia'
+
+        with self._lock:
+            copia = self._copias.setdefault(
+                chave, {'serie': None, 'obtida_em': None, 'tentativa_em': 0, 'erro': None, 'usada_em': inicio}
+            )
+            copia['tentativa_em'] = inicio
+            copia['erro'] = erro
+            if obtida_em is not None and (copia['obtida_em'] is None or obtida_em >= copia['obtida_em']):
+                copia['serie'] = serie
+                copia['obtida_em'] = obtida_em
+        if erro:
+            logger.warning(f"Falha ao atualizar {chave}, mantendo a última cópia: {erro}")
+
+    def obter(self, chave):
+        """Retorna a última cópia da série; só bloqueia na primeira vez que a chave é pedida"""
+        self._iniciar_agendador()
+        agora = time.time()
+
+        copia = self._copias.get(chave)
+        if copia is None:
+            self.atualizar(chave)
+            copia = self._copias[chave]
+        copia['usada_em'] = agora
+
+        if self._vencida(copia, agora):
+            self._acordar.set()
+        return copia['serie']
+
+    def versao(self, chave):
+        """Identifica a cópia servida (hora dos dados e erro atual), ou None se não houver"""
+        copia = self._copias.get(chave)
+        if copia is None:
+            return None
+        return (copia['obtida_em'], copia['erro'])
+
+    def frescor(self, chave):
+        """Metadados de atualização da cópia servida para a chave"""
+        copia = self._copias.get(chave)
+        if copia is None:
+            return {'obtido_em': None, 'idade_segundos': None, 'desatualizado': True, 'erro': 'carregando'}
+
+        obtida_em = copia['obtida_em']
+        idade = None if obtida_em is None else round(time.time() - obtida_em)
+        return {
+            'obtido_em': None if obtida_em is None else datetime.fromtimestamp(obtida_em).isoformat(timespec='seconds'),
+            'idade_segundos': idade,
+            'desatualizado': idade is None or idade > self.validade or copia['erro'] is not None,
+            'erro': copia['erro']
+        }
+
+    def _loop(self):
+        while True:
+            self._acordar.wait(self.intervalo_verificacao)
+            self._acordar.clear()
+
+            agora = time.time()
+            with self._lock:
+                # Esquece chaves que ninguém pede há muito tempo
+                for chave in [c for c, copia in self._copias.items() if agora - copia['usada_em'] > self.abandono]:
+                    del self._copias[chave]
+                vencidas = [c for c, copia in self._copias.items() if self._vencida(copia, agora)]
+
+            for chave in vencidas:
+                try:
+                    self.atualizar(chave)
+                except Exception as e:
+                    logger.exception(f"Erro no atualizador de séries ({chave}): {str(e)}")